@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量统计聚合
+每条结果以 O(1) 更新各分类的计数、情感总分、最高紧迫度和典型槽点，
+按输入顺序切分的多个分片可以合并为整体结果
+"""
+
+from typing import Dict, Tuple
+
+from results import INVALID_CATEGORY_CODE, URGENCY_LABELS, Urgency
+
+
+class CategoryStats:
+    """单个分类的统计量"""
+
+    __slots__ = ("count", "sentiment_sum", "highest_urgency", "typical_issue")
+
+    def __init__(self):
+        self.count = 0
+        self.sentiment_sum = 0
+        self.highest_urgency = Urgency.NA
+        self.typical_issue = "无"
+
+    def add(self, sentiment: int, urgency: int, core_issue: str, weight: int = 1):
+        self.count += weight
+        self.sentiment_sum += sentiment * weight
+        # 典型槽点取最高紧迫度下最先出现的评论
+        if urgency < self.highest_urgency:
+            self.highest_urgency = urgency
+            self.typical_issue = core_issue
+
+    def merge(self, other: "CategoryStats"):
+        """合并排在本分片之后的分片"""
+        self.count += other.count
+        self.sentiment_sum += other.sentiment_sum
+        if other.highest_urgency < self.highest_urgency:
+            self.highest_urgency = other.highest_urgency
+            self.typical_issue = other.typical_issue
+
+
+class StatsAggregator:
+    """按分类增量聚合分析结果（跳过无效数据）"""
+
+    def __init__(self, category_labels: Tuple[str, ...]):
+        self.category_labels = category_labels
+        self.categories: Dict[int, CategoryStats] = {}
+        self.total = 0
+
+    def add(self, category: int, sentiment: int, urgency: int, core_issue: str, weight: int = 1):
+        """加入一条编码后的结果（weight 为近重复折叠后代表的评论条数）"""
+        self.total += weight
+        if category == INVALID_CATEGORY_CODE:
+            return
+        stats = self.categories.get(category)
+        if stats is None:
+            stats = self.categories[category] = CategoryStats()
+        stats.add(sentiment, urgency, core_issue, weight)
+
+    def add_batch(self, batch, start: int = 0):
+        """加入 BatchResult 中第 start 行及之后的结果（逐块追加的批量结果可只加入新行）"""
+        issues = batch.issues
+        for category, sentiment, urgency, issue_code in zip(
+                batch.categories[start:], batch.sentiments[start:], batch.urgencies[start:],
+                batch.issue_codes[start:]):
+            self.add(category, sentiment, urgency, issues[issue_code])
+
+    def merge(self, other: "StatsAggregator") -> "StatsAggregator":
+        """合并另一个分片的统计（other 须位于本分片之后，以保证典型槽点取最先出现的评论）"""
+        if other.category_labels != self.category_labels:
+            raise ValueError("只能合并使用相同规则集的统计结果")
+        self.total += other.total
+        for category, other_stats in other.categories.items():
+            stats = self.categories.get(category)
+            if stats is None:
+                stats = self.categories[category] = CategoryStats()
+            stats.merge(other_stats)
+        return self
+
+    def summary(self) -> Dict:
+        """生成与 CommentAnalyzer.aggregate_statistics 相同格式的统计结果"""
+        aggregated = {}
+        for category, stats in self.categories.items():
+            aggregated[self.category_labels[category]] = {
+                "count": stats.count,
+                "avg_sentiment": round(stats.sentiment_sum / stats.count, 1),
+                "highest_urgency": URGENCY_LABELS[stats.highest_urgency],
+                "typical_issue": stats.typical_issue
+            }
+        return aggregated
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评论激增告警
+在分析结果流上按固定时段统计各分类 × 紧迫度的评论数与各分类的负面评论比例，
+以指数加权移动平均（EWMA）作为基线，P0 评论量或负面比例在当前时段或最近几个时段的滑动窗口内
+显著高于基线时立即产生告警。每个序列只保存常数个统计量，逐条更新为 O(1)
+"""
+
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from results import INVALID_CATEGORY_CODE, URGENCY_LABELS, Sentiment, Urgency
+
+# 跳过的空时段超过该数目后基线已衰减到可忽略，不再逐段衰减
+_MAX_IDLE_STEPS = 200
+
+# 基线高于该值时泊松分布用正态近似
+_POISSON_EXACT_MAX = 50.0
+
+# 上尾概率低于该值时 1 - 累计概率已无法在浮点精度内分辨，改为直接计算上尾
+_POISSON_MIN_TAIL = 1e-12
+
+_NO_ALERTS: Tuple = ()
+
+
+def _log_normal_tail(threshold: float) -> float:
+    """标准正态分布上尾概率 P(Z >= threshold) 的自然对数（erfc 下溢时用渐近式）"""
+    tail = 0.5 * math.erfc(threshold / math.sqrt(2))
+    if tail > 0:
+        return math.log(tail)
+    return -threshold * threshold / 2 - math.log(threshold * math.sqrt(2 * math.pi))
+
+
+def _log_poisson_tail(mean: float, k: int) -> float:
+    """泊松分布（均值 mean）P(X >= k) 的自然对数，要求 k > mean（级数各项按比例递减）"""
+    if mean <= 0:
+        return -math.inf
+    total = term = 1.0
+    j = k
+    while term > 1e-17 * total:
+        j += 1
+        term *= mean / j
+        total += term
+    return -mean + k * math.log(mean) - math.lgamma(k + 1) + math.log(total)
+
+
+def _poisson_limit(mean: float, threshold: float) -> float:
+    """泊松分布（均值 mean）下 P(X >= k) 不超过 z 分数 threshold 对应上尾概率的最小 k
+
+    基线计数较小时正态近似的尾部概率偏低、误报偏多，按泊松分布精确累加；
+    阈值很大、上尾概率小于浮点精度时在对数域直接计算上尾。
+    """
+    if mean > _POISSON_EXACT_MAX:
+        return mean + threshold * math.sqrt(mean) + 0.5
+    tail = 0.5 * math.erfc(threshold / math.sqrt(2))
+    if tail < _POISSON_MIN_TAIL:
+        log_tail = _log_normal_tail(threshold)
+        k = math.floor(mean) + 1
+        while _log_poisson_tail(mean, k) > log_tail:
+            k += 1
+        return k
+    probability = math.exp(-mean)
+    cumulative = probability
+    k = 0
+    while 1 - cumulative > tail:
+        k += 1
+        probability *= mean / k
+        if not probability:
+            # 概率下溢后累计值不再变化，继续循环不会终止
+            break
+        cumulative += probability
+    return k + 1
+
+
+class Alert:
+    """一条告警"""
+
+    __slots__ = ("kind", "category", "category_label", "urgency", "interval_start", "intervals",
+                 "observed", "expected", "score", "sample")
+
+    def __init__(self, kind: str, category: int, category_label: str, urgency: Optional[int],
+                 interval_start: int, intervals: int, observed: float, expected: float, score: float,
+                 sample: str):
+        self.kind = kind  # "volume"：评论量激增；"negative"：负面比例升高
+        self.category = category
+        self.category_label = category_label
+        self.urgency = urgency
+        self.interval_start = interval_start
+        # 统计覆盖的时段数：1 为当前时段，大于 1 为截至当前时段的滑动窗口
+        self.intervals = intervals
+        self.observed = observed
+        self.expected = expected
+        self.score = score
+        # 触发告警的评论的核心槽点
+        self.sample = sample
+
+    @property
+    def message(self) -> str:
+        start = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.interval_start))
+        scope = "本时段" if self.intervals == 1 else f"近 {self.intervals} 个时段"
+        if self.kind == "volume":
+            return (f"[{start}] {self.category_label} {URGENCY_LABELS[self.urgency]} 评论激增："
+                    f"{scope} {self.observed:g} 条，基线 {self.expected:.1f} 条（z={self.score:.1f}），"
+                    f"槽点：{self.sample}")
+        return (f"[{start}] {self.category_label} 负面评论比例升高：{scope} {self.observed:.0%}，"
+                f"基线 {self.expected:.0%}（z={self.score:.1f}），槽点：{self.sample}")
+
+    def to_dict(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "category": self.category_label,
+            "urgency": URGENCY_LABELS[self.urgency] if self.urgency is not None else None,
+            "interval_start": self.interval_start,
+            "intervals": self.intervals,
+            "observed": self.observed,
+            "expected": round(self.expected, 4),
+            "score": round(self.score, 2),
+            "sample": self.sample,
+            "message": self.message,
+        }
+
+    def __repr__(self) -> str:
+        return f"Alert({self.message!r})"
+
+
+class _Series:
+    """一个序列：当前时段的计数、之前若干时段的计数（滑动窗口）与历史时段计数的 EWMA 均值、方差"""
+
+    __slots__ = ("interval", "count", "trials", "mean", "var", "trials_mean", "intervals",
+                 "recent", "recent_trials", "recent_sum", "recent_trials_sum", "position",
+                 "limit", "window_limit", "alerted")
+
+    def __init__(self, interval: int, intervals: int, window: int):
+        self.interval = interval
+        self.count = 0
+        # 负面比例序列：本时段有效评分条数
+        self.trials = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.trials_mean = 0.0
+        # 已结束的时段数（含创建前的空时段）
+        self.intervals = intervals
+        # 之前 window - 1 个时段的计数（环形缓冲区）
+        self.recent = [0] * (window - 1)
+        self.recent_trials = [0] * (window - 1)
+        self.recent_sum = 0
+        self.recent_trials_sum = 0
+        self.position = 0
+        # 当前时段 / 滑动窗口计数达到该值即告警（时段切换时计算）
+        self.limit = math.inf
+        self.window_limit = math.inf
+        self.alerted = False
+
+    def fold(self, count: float, trials: float, alpha: float):
+        """将一个已结束时段的计数并入基线"""
+        delta = count - self.mean
+        self.mean += alpha * delta
+        self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        self.trials_mean += alpha * (trials - self.trials_mean)
+
+    def push(self, count: int, trials: int):
+        """已结束时段的计数移入滑动窗口"""
+        if not self.recent:
+            return
+        position = self.position
+        self.recent_sum += count - self.recent[position]
+        self.recent_trials_sum += trials - self.recent_trials[position]
+        self.recent[position] = count
+        self.recent_trials[position] = trials
+        self.position = (position + 1) % len(self.recent)
+
+
+def _binomial_score(count: int, trials: int, p: float) -> float:
+    return (count - trials * p) / math.sqrt(trials * p * (1 - p))
+
+
+class SpikeDetector:
+    """评论激增检测器（非线程安全，与分析在同一线程中使用）
+
+    interval 为统计时段长度（秒）；alpha 为 EWMA 平滑系数，越大基线跟随越快；
+    window 为滑动窗口的时段数，用于发现单个时段不够显著、但持续数个时段的上升；
+    warmup 个时段之内只积累基线不告警；计数至少 min_count 且达到 z 分数 threshold 对应的显著性才告警，
+    同一序列每个时段最多告警一次。
+    """
+
+    def __init__(self, category_labels: Tuple[str, ...], interval: int = 300, alpha: float = 0.05,
+                 window: int = 3, threshold: float = 4.0, min_count: int = 5, warmup: int = 12,
+                 urgencies: Iterable[int] = (Urgency.P0,), min_negative_ratio: float = 0.05,
+                 on_alert: Optional[Callable[[Alert], None]] = None, history: int = 100):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha 需在 (0, 1] 之间")
+        if window < 1:
+            raise ValueError("window 至少为 1")
+        self.category_labels = category_labels
+        self.interval = interval
+        self.alpha = alpha
+        self.window = window
+        self.threshold = threshold
+        self.min_count = min_count
+        self.warmup = warmup
+        # 评论量告警针对的紧迫度（所有紧迫度都会统计）
+        self.urgencies = frozenset(urgencies)
+        # 负面比例基线的下限，避免基线接近 0 时少量负面评论就触发告警
+        self.min_negative_ratio = min_negative_ratio
+        self.on_alert = on_alert
+        # 最近的告警
+        self.alerts: Deque[Alert] = deque(maxlen=history)
+        self.volume: Dict[Tuple[int, int], _Series] = {}
+        self.negative: Dict[int, _Series] = {}
+        self.first_interval: Optional[int] = None
+
+    def _series(self, table: Dict, key, interval: int, limited: bool = True) -> _Series:
+        """取出序列并推进到 interval 时段；limited 为 False 时不计算评论量告警线（负面比例序列）"""
+        series = table.get(key)
+        if series is None:
+            # 序列创建之前的时段计数均为 0，基线从 0 开始
+            series = table[key] = _Series(interval, (interval - self.first_interval) // self.interval, self.window)
+        elif interval > series.interval:
+            self._advance(series, interval)
+        else:
+            return series
+        if limited:
+            self._update_limits(series)
+        return series
+
+    def _advance(self, series: _Series, interval: int):
+        """结束当前时段并入基线，跳过的空时段按 0 并入
+
+        超过告警线的计数按告警线并入，激增本身不会迅速抬高基线而掩盖后续时段。
+        """
+        steps = (interval - series.interval) // self.interval
+        series.fold(min(series.count, series.limit), series.trials, self.alpha)
+        series.push(series.count, series.trials)
+        for step in range(min(steps - 1, _MAX_IDLE_STEPS)):
+            series.fold(0, 0, self.alpha)
+            if step < self.window - 1:
+                series.push(0, 0)
+        series.intervals += steps
+        series.interval = interval
+        series.count = 0
+        series.trials = 0
+        series.alerted = False
+
+    def _update_limits(self, series: _Series):
+        if series.intervals < self.warmup:
+            series.limit = series.window_limit = math.inf
+            return
+        # 计数近似泊松分布；实际波动更大（方差高于均值）时按 EWMA 方差放宽
+        series.limit = max(_poisson_limit(series.mean, self.threshold),
+                           series.mean + self.threshold * math.sqrt(series.var), self.min_count)
+        if self.window > 1:
+            mean = series.mean * self.window
+            series.window_limit = max(_poisson_limit(mean, self.threshold),
+                                      mean + self.threshold * math.sqrt(series.var * self.window),
+                                      self.min_count)
+
+    def add(self, category: int, sentiment: int, urgency: int, core_issue: str = "",
+            timestamp: Optional[float] = None) -> Tuple[Alert, ...]:
+        """加入一条编码后的结果（timestamp 默认为当前时间），返回本条触发的告警
+
+        早于序列当前时段的迟到结果计入当前时段。
+        """
+        if category == INVALID_CATEGORY_CODE:
+            return _NO_ALERTS
+        if timestamp is None:
+            timestamp = time.time()
+        interval = int(timestamp // self.interval * self.interval)
+        if self.first_interval is None:
+            self.first_interval = interval
+
+        alerts = _NO_ALERTS
+        series = self._series(self.volume, (category, urgency), interval)
+        series.count += 1
+        if not series.alerted and urgency in self.urgencies:
+            if series.count >= series.limit:
+                alerts = (self._volume_alert(series, category, urgency, 1, series.count, core_issue),)
+            elif series.count + series.recent_sum >= series.window_limit:
+                alerts = (self._volume_alert(series, category, urgency, self.window,
+                                             series.count + series.recent_sum, core_issue),)
+
+        if sentiment != Sentiment.NA:
+            series = self._series(self.negative, category, interval, limited=False)
+            series.trials += 1
+            if sentiment <= Sentiment.DISSATISFIED:
+                series.count += 1
+                alert = self._check_negative(series, category, core_issue)
+                if alert is not None:
+                    alerts += (alert,)
+        return alerts
+
+    def _volume_alert(self, series: _Series, category: int, urgency: int, intervals: int, observed: int,
+                      core_issue: str) -> Alert:
+        series.alerted = True
+        expected = series.mean * intervals
+        spread = math.sqrt(max(series.var * intervals, expected, 1.0))
+        return self._emit(Alert(
+            "volume", category, self.category_labels[category], urgency, series.interval, intervals,
+            observed, expected, (observed - expected) / spread, core_issue
+        ))
+
+    def _check_negative(self, series: _Series, category: int, core_issue: str) -> Optional[Alert]:
+        if series.alerted or series.intervals < self.warmup:
+            return None
+        # 以基线负面比例为概率的二项分布检验，先看当前时段，再看滑动窗口
+        baseline = series.mean / series.trials_mean if series.trials_mean > 0 else 0.0
+        p = min(max(baseline, self.min_negative_ratio), 0.99)
+        for intervals, count, trials in (
+                (1, series.count, series.trials),
+                (self.window, series.count + series.recent_sum, series.trials + series.recent_trials_sum)):
+            if count < self.min_count:
+                continue
+            score = _binomial_score(count, trials, p)
+            if score >= self.threshold:
+                series.alerted = True
+                return self._emit(Alert(
+                    "negative", category, self.category_labels[category], None, series.interval, intervals,
+                    count / trials, p, score, core_issue
+                ))
+            if self.window == 1:
+                break
+        return None
+
+    def _emit(self, alert: Alert) -> Alert:
+        self.alerts.append(alert)
+        if self.on_alert is not None:
+            self.on_alert(alert)
+        return alert
+
+    def add_result(self, result, timestamp: Optional[float] = None) -> Tuple[Alert, ...]:
+        """加入一条 AnalysisResult"""
+        return self.add(result.category, result.sentiment, result.urgency, result.core_issue, timestamp)
+
+    def snapshot(self) -> List[Dict]:
+        """各评论量序列最近活跃时段的计数与基线（按基线从高到低），供看板展示"""
+        rows = []
+        for (category, urgency), series in self.volume.items():
+            rows.append({
+                "category": self.category_labels[category],
+                "urgency": URGENCY_LABELS[urgency],
+                "interval_start": series.interval,
+                "count": series.count,
+                "window_count": series.count + series.recent_sum,
+                "baseline": round(series.mean, 3),
+                "std": round(math.sqrt(series.var), 3),
+                "threshold": None if series.limit == math.inf else round(series.limit, 1),
+            })
+        rows.sort(key=lambda row: row["baseline"], reverse=True)
+        return rows
@@ -5,8 +5,51 @@
 基于Streamlit构建 - Apple极简风格
 """
 
+import csv
+import hashlib
+import io
+import re
+import threading
+import time
+import uuid
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
 import streamlit as st
-from comment_analyzer import CommentAnalyzer
+from aggregator import StatsAggregator
+from cache import LRUCache
+from comment_analyzer import CommentAnalyzer, REPORT_SEPARATOR
+from exporters import WRITERS
+from ingest import CommentSource, guess_comment_column
+from jobs import DEFAULT_WORKERS, Job, JobLimitError, JobManager, JobStatus
+from results import BatchResult, URGENCY_LABELS
+
+# 每块分析的评论条数（也是进度汇报与取消检查的粒度）
+CHUNK_SIZE = 5000
+
+# 后台分析线程数（所有会话共享）与每个会话的并发任务上限
+JOB_WORKERS = DEFAULT_WORKERS
+MAX_JOBS_PER_SESSION = 1
+
+# 任务每分析多少条评论发布一次部分统计
+REFRESH_EVERY = 1000
+
+# 任务运行时页面刷新进度的间隔（秒）
+JOB_POLL_INTERVAL = 0.5
+
+# 所有会话共享的已完成报告缓存：条数上限与字节预算（按列式结果及其引用的评论原文估算）
+REPORT_CACHE_SIZE = 32
+REPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 明细表每页可选条数
+PAGE_SIZES = (50, 100, 200, 500)
+
+# 可下载的格式：(选项名称, 文件名, MIME 类型)；文件只在点击"准备下载"后生成
+EXPORT_FORMATS = {
+    "markdown": ("分析报告（Markdown）", "comment_analysis_report.md", "text/markdown"),
+    "csv": ("明细数据（CSV）", "comment_analysis.csv", "text/csv"),
+    "jsonl": ("明细数据（JSONL）", "comment_analysis.jsonl", "application/x-ndjson"),
+}
 
 # 设置页面配置
 st.set_page_config(
@@ -17,7 +60,7 @@ st.set_page_config(
 )
 
 # Apple极简风格 CSS - 增强版（交互式动画设计）
-st.markdown("""
+APP_CSS = """
 <style>
     /* 全局样式重置 */
     .stApp {
@@ -621,10 +664,298 @@ st.markdown("""
         color: inherit;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def get_minified_css() -> str:
+    """压缩样式表（去掉注释与多余空白），每个进程只计算一次"""
+    css = re.sub(r'/\*.*?\*/', '', APP_CSS, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};])\s*', r'\1', css).strip()
+
+
+@st.cache_resource
+def get_analyzer() -> Tuple[CommentAnalyzer, threading.Lock]:
+    """编译好的分析器（含结果缓存）在所有会话间共享，分析时需持有锁"""
+    return CommentAnalyzer(), threading.Lock()
+
+
+def hash_comments(comments: List[str]) -> str:
+    """输入评论的内容哈希，作为分析结果的缓存键"""
+    digest = hashlib.sha256()
+    for comment in comments:
+        digest.update(comment.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def hash_upload(uploaded, column: int) -> str:
+    """上传文件的内容哈希（含所选列），作为分析结果的缓存键"""
+    digest = hashlib.sha256(f"{uploaded.name}:{column}:".encode("utf-8"))
+    uploaded.seek(0)
+    for block in iter(lambda: uploaded.read(1 << 20), b""):
+        digest.update(block)
+    uploaded.seek(0)
+    return digest.hexdigest()
+
+
+def reopen_upload(uploaded) -> io.BytesIO:
+    """上传文件的独立只读句柄，供后台任务读取，与页面重跑读取表头互不干扰
+
+    新的 BytesIO 与上传文件共享同一个 bytes 对象（写时复制），不复制文件内容；
+    不要改用 getbuffer()：导出缓冲区会迫使上传文件先复制一份完整内容
+    """
+    return io.BytesIO(uploaded.getvalue())
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """所有会话共享的后台任务线程池，每个会话限制并发任务数"""
+    return JobManager(JOB_WORKERS, MAX_JOBS_PER_SESSION)
+
+
+@st.cache_resource
+def get_report_cache() -> Tuple[LRUCache, threading.Lock]:
+    """已完成的报告按输入哈希缓存，所有会话共享，总大小不超过 REPORT_CACHE_BYTES"""
+    return LRUCache(REPORT_CACHE_SIZE, REPORT_CACHE_BYTES), threading.Lock()
+
+
+def iter_comment_chunks(comments: List[str], chunk_size: int) -> Iterator[List[str]]:
+    """将评论列表切成块"""
+    for start in range(0, len(comments), chunk_size):
+        yield comments[start:start + chunk_size]
+
+
+def analysis_job(job: Job, analyzer: CommentAnalyzer, lock: threading.Lock, chunks: Iterable[List[str]],
+                 progress_of: Callable[[int], float], input_hash: str) -> Dict:
+    """后台任务：逐块分析评论，每 REFRESH_EVERY 条发布一次部分统计，并检查是否已取消"""
+    batch = BatchResult([], analyzer.rules.category_labels)
+    stats = StatsAggregator(batch.category_labels)
+    for chunk in chunks:
+        for start in range(0, len(chunk), REFRESH_EVERY):
+            job.check_cancelled()
+            analyzed = len(batch)
+            # 每段单独持锁，其他会话的任务可以穿插进行
+            with lock:
+                analyzer.extend_batch(batch, chunk[start:start + REFRESH_EVERY])
+            stats.add_batch(batch, analyzed)
+            job.publish({
+                "count": len(batch),
+                "batch": batch,
+                "summary_table": analyzer.generate_summary_table(stats.summary()),
+            })
+            job.update(len(batch), progress_of(len(batch)))
+    job.check_cancelled()
+    return build_report(input_hash, analyzer, batch, stats)
+
+
+def start_analysis(input_hash: str, chunks: Iterable[List[str]], progress_of: Callable[[int], float]):
+    """相同输入直接复用缓存的报告，否则提交后台任务并把任务句柄保存在会话中"""
+    report_cache, cache_lock = get_report_cache()
+    with cache_lock:
+        cached = report_cache.get(input_hash)
+    if cached is not None:
+        st.session_state["report"] = cached
+        return
+    
+    analyzer, lock = get_analyzer()
+    try:
+        st.session_state["job"] = get_job_manager().submit(
+            st.session_state["session_id"], analysis_job, analyzer, lock, chunks, progress_of, input_hash
+        )
+    except JobLimitError as e:
+        st.warning(f"⚠️ {str(e)}")
+
+
+def collect_job(job: Job):
+    """任务结束后取回结果或展示错误"""
+    if job.status is JobStatus.DONE:
+        report = job.result
+        if not report["count"]:
+            st.warning("⚠️ 没有找到有效的评论！")
+            return
+        report_cache, cache_lock = get_report_cache()
+        nbytes = report["batch"].nbytes()
+        with cache_lock:
+            report_cache.put(report["input_hash"], report, nbytes)
+        st.session_state["report"] = report
+    elif job.status is JobStatus.FAILED:
+        st.error(f"❌ 分析过程中出现错误：{str(job.error)}")
+        st.exception(job.error)
+    else:
+        st.info("分析已取消")
+
+
+def format_eta(seconds) -> str:
+    """剩余时间的展示文本"""
+    if seconds is None:
+        return "估算中"
+    if seconds < 60:
+        return f"约 {seconds:.0f} 秒"
+    return f"约 {seconds / 60:.1f} 分钟"
+
+
+def render_job(job: Job):
+    """展示后台任务进度（提供取消按钮），以及已完成部分的汇总表和最新明细"""
+    col_progress, col_cancel = st.columns([4, 1])
+    with col_progress:
+        if job.status is JobStatus.PENDING:
+            text = f"{job.status.value}：等待空闲的分析线程..."
+        else:
+            text = (f"{job.status.value}：已分析 {job.processed} 条评论 · "
+                    f"{job.throughput():,.0f} 条/秒 · 剩余{format_eta(job.eta())}")
+        st.progress(job.progress, text=text)
+    with col_cancel:
+        if st.button("取消分析", disabled=job.cancel_requested, use_container_width=True):
+            job.cancel()
+    
+    partial = job.partial
+    if partial is None:
+        return
+    
+    # 部分统计随分析推进刷新，高危问题无需等全部分析完成即可看到
+    st.markdown(f'### 📈 核心数据汇总表（已完成 {partial["count"]} 条）')
+    st.markdown(partial["summary_table"])
+    
+    # 只展示最新完成的一页明细，完整明细在任务结束后分页浏览
+    st.markdown('### 📋 最新分析明细')
+    page_size = PAGE_SIZES[0]
+    latest = range(max(0, partial["count"] - page_size), partial["count"])
+    st.dataframe(detail_page(partial["batch"], latest, 1, page_size), hide_index=True, use_container_width=True)
+
+
+def build_report(input_hash: str, analyzer: CommentAnalyzer, batch: BatchResult,
+                 stats: StatsAggregator) -> Dict:
+    """报告只保存列式结果与汇总表，下载文件在需要时再由列式结果生成"""
+    return {
+        "count": len(batch),
+        "input_hash": input_hash,
+        "batch": batch,
+        "summary_table": analyzer.generate_summary_table(stats.summary()),
+    }
+
+
+def export_payload(report: Dict, fmt: str) -> bytes:
+    """由列式结果流式写出下载文件（Markdown 报告或 CSV / JSONL 明细）"""
+    buffer = io.BytesIO()
+    # CSV 带 BOM，Excel 直接打开不乱码
+    sink = io.TextIOWrapper(buffer, encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    records = report["batch"].iter_records()
+    if fmt == "markdown":
+        analyzer, _ = get_analyzer()
+        sink.write(report["summary_table"])
+        sink.write(REPORT_SEPARATOR)
+        analyzer.write_detail_table(sink, records)
+    else:
+        WRITERS[fmt](records, sink)
+    sink.flush()
+    sink.detach()
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def filter_rows(input_hash: str, categories: Tuple[int, ...], urgencies: Tuple[int, ...],
+                _batch: BatchResult) -> array:
+    """在服务端按分类、紧迫度筛选明细行（空元组表示不筛选），结果按输入和筛选条件缓存"""
+    return _batch.select(categories or None, urgencies or None)
+
+
+def detail_page(batch: BatchResult, rows: Sequence[int], page: int, page_size: int) -> List[Dict]:
+    """取出当前页的明细行，列名与 Markdown 明细表一致"""
+    start = (page - 1) * page_size
+    page_rows = []
+    for i in rows[start:start + page_size]:
+        result = batch.record(i)
+        page_rows.append({
+            "ID": result.id,
+            "一级分类": result.category_label,
+            "情感分数": result.sentiment_label,
+            "紧迫度": result.urgency_label,
+            "核心槽点": result.core_issue,
+            "原文摘要（前10字）": result.summary,
+        })
+    return page_rows
+
+
+def render_detail_view(report: Dict):
+    """分页展示明细表：筛选和分页都在服务端完成，浏览器只接收当前页"""
+    batch = report["batch"]
+    category_labels = batch.category_labels
+    
+    col_category, col_urgency, col_size = st.columns([2, 2, 1])
+    with col_category:
+        selected_categories = st.multiselect("一级分类", category_labels, key="detail_categories")
+    with col_urgency:
+        selected_urgencies = st.multiselect("紧迫度", URGENCY_LABELS, key="detail_urgencies")
+    with col_size:
+        page_size = st.selectbox("每页条数", PAGE_SIZES, key="detail_page_size")
+    
+    rows = filter_rows(
+        report["input_hash"],
+        tuple(category_labels.index(label) for label in selected_categories),
+        tuple(URGENCY_LABELS.index(label) for label in selected_urgencies),
+        batch
+    )
+    total_pages = max(1, -(-len(rows) // page_size))
+    
+    # 筛选条件变化后页数可能变少，先把页码收回到有效范围
+    if st.session_state.get("detail_page", 1) > total_pages:
+        st.session_state["detail_page"] = total_pages
+    page = st.number_input("页码", min_value=1, max_value=total_pages, step=1, key="detail_page")
+    
+    st.dataframe(detail_page(batch, rows, page, page_size), hide_index=True, use_container_width=True)
+    st.caption(f"共 {len(rows)} 条，第 {page}/{total_pages} 页")
+
+
+def render_report(report: Dict):
+    """展示分析报告和下载按钮"""
+    # 显示统计信息
+    st.success(f"✅ 成功分析 {report['count']} 条评论！")
+    
+    # 结果区域
+    st.markdown('<div class="result-section">', unsafe_allow_html=True)
+    
+    # 分隔线
+    st.divider()
+    
+    # 核心数据汇总表
+    st.markdown('### 📈 核心数据汇总表')
+    st.markdown(report["summary_table"])
+    
+    st.divider()
+    
+    # 全量评论分析明细表
+    st.markdown('### 📋 全量评论分析明细表')
+    render_detail_view(report)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # 下载：先选择格式并准备文件，只在这一次重跑中生成数据，不随每次重跑重复生成和哈希
+    st.divider()
+    col_format, col_prepare = st.columns([3, 1])
+    with col_format:
+        fmt = st.selectbox("下载格式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0],
+                           key="export_format", label_visibility="collapsed")
+    with col_prepare:
+        prepare = st.button("📦 准备下载", use_container_width=True)
+    if prepare:
+        label, file_name, mime = EXPORT_FORMATS[fmt]
+        with st.spinner("正在生成下载文件..."):
+            data = export_payload(report, fmt)
+        st.download_button(
+            label=f"📥 下载{label}",
+            data=data,
+            file_name=file_name,
+            mime=mime,
+            use_container_width=True
+        )
 
 
 def main():
+    # Streamlit 每次重跑都会重建页面，样式需要重新输出；压缩结果已缓存
+    st.markdown(get_minified_css(), unsafe_allow_html=True)
+    
     # 主标题（在卡片外）
     st.markdown('<h1 class="main-title">用户声音洞察</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">VOC Insights</p>', unsafe_allow_html=True)
@@ -637,10 +968,10 @@ def main():
             st.markdown("""
             ### 使用说明
             
-            1. 在下方文本框中输入或粘贴用户评论（每行一条）
+            1. 在下方文本框中输入或粘贴用户评论（每行一条），或上传 CSV / XLSX / TXT 文件
             2. 点击"生成分析报告"按钮
             3. 查看分析结果和统计报告
-            4. 可选择下载 Markdown 格式的报告
+            4. 可选择格式（Markdown 报告、CSV / JSONL 明细）准备并下载文件
             
             ### 分类标准
             
@@ -674,13 +1005,37 @@ def main():
     # 输入方式选择
     input_method = st.radio(
         "",
-        ["直接输入", "示例数据"],
+        ["直接输入", "示例数据", "上传文件"],
         horizontal=True,
         label_visibility="collapsed"
     )
     
     # 输入框
-    if input_method == "示例数据":
+    comments_text = ""
+    source = None
+    column = 0
+    if input_method == "上传文件":
+        uploaded = st.file_uploader(
+            "上传评论文件",
+            type=["csv", "xlsx", "txt"],
+            help="CSV / XLSX 第一行为表头；TXT 每行一条评论"
+        )
+        if uploaded is not None:
+            try:
+                source = CommentSource(uploaded, name=uploaded.name)
+                columns = source.columns()
+            except (ImportError, ValueError, csv.Error) as e:
+                st.error(f"❌ 无法读取文件：{str(e)}")
+                source = None
+                columns = []
+            if columns:
+                column = st.selectbox(
+                    "评论所在列",
+                    range(len(columns)),
+                    index=guess_comment_column(columns),
+                    format_func=lambda i: columns[i]
+                )
+    elif input_method == "示例数据":
         sample_comments = """昨天更新后应用一直闪退，根本用不了！
 界面设计太难看了，按钮也找不到
 会员价格太贵了，能不能便宜点
@@ -718,8 +1073,24 @@ def main():
     # 关闭卡片容器
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # 执行分析
-    if analyze_button:
+    # 会话标识，用于限制每个会话的并发任务数
+    st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    job = st.session_state.get("job")
+    
+    # 提交分析任务（在共享线程池中运行，不阻塞页面）
+    if analyze_button and job is not None:
+        st.warning("⚠️ 当前分析任务尚未结束，请等待完成或先取消")
+    elif analyze_button and input_method == "上传文件":
+        if source is None:
+            st.warning("⚠️ 请先上传评论文件！")
+        else:
+            job_source = CommentSource(reopen_upload(uploaded), name=uploaded.name)
+            start_analysis(
+                hash_upload(uploaded, column),
+                job_source.iter_chunks(column, CHUNK_SIZE),
+                lambda processed: job_source.progress
+            )
+    elif analyze_button:
         if not comments_text.strip():
             st.warning("⚠️ 请输入至少一条评论！")
         else:
@@ -729,53 +1100,30 @@ def main():
             if not comments:
                 st.warning("⚠️ 没有找到有效的评论！")
             else:
-                with st.spinner(f'正在分析 {len(comments)} 条评论...'):
-                    try:
-                        # 创建分析器并分析
-                        analyzer = CommentAnalyzer()
-                        analyzer.add_comments(comments)
-                        report = analyzer.generate_report()
-                        
-                        # 显示统计信息
-                        st.success(f"✅ 成功分析 {len(comments)} 条评论！")
-                        
-                        # 结果区域
-                        st.markdown('<div class="result-section">', unsafe_allow_html=True)
-                        
-                        # 分隔线
-                        st.divider()
-                        
-                        # 解析报告（分为两个表格）
-                        parts = report.split('\n---\n')
-                        
-                        if len(parts) >= 2:
-                            # 核心数据汇总表
-                            st.markdown('### 📈 核心数据汇总表')
-                            st.markdown(parts[0])
-                            
-                            st.divider()
-                            
-                            # 全量评论分析明细表
-                            st.markdown('### 📋 全量评论分析明细表')
-                            st.markdown(parts[1])
-                        else:
-                            # 如果格式不对，直接显示完整报告
-                            st.markdown(report)
-                        
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        # 添加下载按钮
-                        st.divider()
-                        st.download_button(
-                            label="📥 下载分析报告 (Markdown格式)",
-                            data=report,
-                            file_name="comment_analysis_report.md",
-                            mime="text/markdown"
-                        )
-                        
-                    except Exception as e:
-                        st.error(f"❌ 分析过程中出现错误：{str(e)}")
-                        st.exception(e)
+                start_analysis(
+                    hash_comments(comments),
+                    iter_comment_chunks(comments, CHUNK_SIZE),
+                    lambda processed: processed / len(comments)
+                )
+    
+    # 展示运行中任务的进度，结束后取回结果
+    job = st.session_state.get("job")
+    if job is not None and job.done:
+        del st.session_state["job"]
+        collect_job(job)
+        job = None
+    elif job is not None:
+        render_job(job)
+    
+    # 报告保存在会话中，切换控件等重跑时无需重新分析；任务运行时改为展示部分结果
+    report = st.session_state.get("report")
+    if report is not None and job is None:
+        render_report(report)
+    
+    # 任务未结束时定时重跑页面以刷新进度
+    if job is not None:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 分析接口
+按块把分析卸载到线程池或进程池，不阻塞事件循环；在途块数有上限（背压），结果按输入顺序返回
+"""
+
+import asyncio
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from aggregator import StatsAggregator
+from results import AnalysisResult
+
+Codes = Tuple[int, int, int, str]
+
+# 线程执行器中同一分析器的各块串行访问结果缓存
+_analyzer_locks: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_analyzer_locks_guard = threading.Lock()
+
+# 进程执行器的子进程中按 (分析器类, 规则指纹) 复用分析器，保留结果缓存
+_worker_analyzers: Dict[Tuple[type, str], object] = {}
+
+
+def _lock_for(analyzer) -> threading.Lock:
+    with _analyzer_locks_guard:
+        lock = _analyzer_locks.get(analyzer)
+        if lock is None:
+            lock = _analyzer_locks[analyzer] = threading.Lock()
+        return lock
+
+
+def _analyze_in_thread(analyzer, lock: threading.Lock, chunk: List[str]) -> List[Codes]:
+    """线程执行器：分析一块评论"""
+    with lock:
+        return [analyzer.analyze_codes(comment) for comment in chunk]
+
+
+def _analyze_in_process(analyzer_cls, fingerprint: str, rules, chunk: List[str]) -> Optional[List[Codes]]:
+    """进程执行器：在子进程中分析一块评论
+
+    通常只传规则指纹；子进程尚未构建该规则集的分析器且 rules 为 None 时返回 None，由父进程附带规则集重试。
+    规则集只在子进程预热前的几块中发送，之后各块不再序列化规则集
+    """
+    key = (analyzer_cls, fingerprint)
+    analyzer = _worker_analyzers.get(key)
+    if analyzer is None:
+        if rules is None:
+            return None
+        analyzer = _worker_analyzers[key] = analyzer_cls(rules)
+    return [analyzer.analyze_codes(comment) for comment in chunk]
+
+
+async def iter_chunks(comments: Union[Iterable[str], AsyncIterable[str]], chunk_size: int,
+                      strip_newlines: bool = False) -> AsyncIterator[List[str]]:
+    """将同步或异步的评论来源切成块"""
+    chunk: List[str] = []
+    if hasattr(comments, "__aiter__"):
+        async for comment in comments:
+            chunk.append(comment.rstrip('\r\n') if strip_newlines else comment)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    else:
+        for comment in comments:
+            chunk.append(comment.rstrip('\r\n') if strip_newlines else comment)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+                # 同步来源较快时让出事件循环
+                await asyncio.sleep(0)
+    if chunk:
+        yield chunk
+
+
+async def analyze_chunks(analyzer, chunks: AsyncIterator[List[str]], executor: Optional[Executor] = None,
+                         max_in_flight: int = 4) -> AsyncIterator[Tuple[List[str], List[Codes]]]:
+    """并发分析各块，产出 (块, 各条编码结果)，顺序与输入一致
+
+    在途块数达到 max_in_flight 时先等待最早的一块完成才继续读取输入，读取速度随消费速度调节。
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight 至少为 1")
+    loop = asyncio.get_running_loop()
+    retry = None
+    if isinstance(executor, ProcessPoolExecutor):
+        # 规则集较大时每块都序列化一次的开销可能超过分析本身，只在子进程缺少规则集时随重试发送
+        rules = analyzer.rules
+        call = (_analyze_in_process, type(analyzer), rules.fingerprint, None)
+        retry = (_analyze_in_process, type(analyzer), rules.fingerprint, rules)
+    else:
+        call = (_analyze_in_thread, analyzer, _lock_for(analyzer))
+
+    async def result(chunk: List[str], future) -> List[Codes]:
+        codes = await future
+        if codes is None:
+            codes = await loop.run_in_executor(executor, *retry, chunk)
+        return codes
+
+    pending = deque()
+    try:
+        async for chunk in chunks:
+            pending.append((chunk, loop.run_in_executor(executor, *call, chunk)))
+            if len(pending) >= max_in_flight:
+                chunk, future = pending.popleft()
+                yield chunk, await result(chunk, future)
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, await result(chunk, future)
+    finally:
+        # 消费方提前退出时取消尚未开始的块
+        for _, future in pending:
+            future.cancel()
+
+
+async def analyze_stream_async(analyzer, comments: Union[Iterable[str], AsyncIterable[str]],
+                               stats: Optional[StatsAggregator] = None, executor: Optional[Executor] = None,
+                               chunk_size: int = 1000, max_in_flight: int = 4) -> AsyncIterator[AnalysisResult]:
+    """异步流式分析，与 analyze_stream 的结果和统计一致"""
+    if stats is None:
+        stats = StatsAggregator(analyzer.rules.category_labels)
+    analyzer.stream_stats = stats
+    category_labels = analyzer.rules.category_labels
+
+    idx = 0
+    chunks = iter_chunks(comments, chunk_size, strip_newlines=True)
+    async for chunk, codes in analyze_chunks(analyzer, chunks, executor, max_in_flight):
+        for comment, (category, sentiment, urgency, core_issue) in zip(chunk, codes):
+            idx += 1
+            stats.add(category, sentiment, urgency, core_issue)
+            yield AnalysisResult(idx, category, sentiment, urgency, core_issue, comment, category_labels)
+
+
+async def analyze_async(analyzer, comments: Optional[List[str]] = None, executor: Optional[Executor] = None,
+                        chunk_size: int = 1000, max_in_flight: int = 4) -> List[AnalysisResult]:
+    """异步版 analyze：结果（含近重复折叠）与 analyze 一致"""
+    if comments is not None:
+        analyzer.add_comments(comments)
+    comments = analyzer.comments
+    loop = asyncio.get_running_loop()
+
+    # 聚类需要更新分析器上的 dedupe_info，始终放在线程中执行
+    clusters = await loop.run_in_executor(None, analyzer.collapse_clusters)
+    positions = [position for position, _ in clusters] if clusters is not None else range(len(comments))
+    category_labels = analyzer.rules.category_labels
+
+    results: List[AnalysisResult] = []
+    chunks = iter_chunks((comments[position] for position in positions), chunk_size)
+    async for chunk, codes in analyze_chunks(analyzer, chunks, executor, max_in_flight):
+        for comment, (category, sentiment, urgency, core_issue) in zip(chunk, codes):
+            n = len(results)
+            weight = clusters[n][1] if clusters is not None else None
+            position = positions[n]
+            results.append(
+                AnalysisResult(position + 1, category, sentiment, urgency, core_issue, comment, category_labels, weight)
+            )
+
+    analyzer.analysis_results = results
+    return results
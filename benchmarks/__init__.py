@@ -0,0 +1,3 @@
+"""
+基准测试：合成语料生成与分析流水线分环节计时（在项目根目录以 python -m benchmarks.run 运行）
+"""
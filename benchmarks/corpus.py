@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成评论语料
+按固定种子生成可复现的评论：分类占比、长度分布、无效数据比例、重复比例均可配置，
+逐条产出，生成千万级语料时内存占用不随条数增长
+
+    python -m benchmarks.corpus --rows 1000000 --seed 1 > corpus.txt
+"""
+
+import argparse
+import math
+import random
+import sys
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from comment_analyzer import CommentAnalyzer
+from rules import RuleSet
+
+# 各分类默认占比（按规则集中的分类顺序）
+DEFAULT_CATEGORY_MIX = (0.25, 0.2, 0.2, 0.15, 0.2)
+
+# 不含关键词的填充短语
+FILLER = (
+    "今天", "昨天", "更新后", "这个应用", "听歌的时候", "每次打开", "我觉得", "真的", "一直",
+    "有点", "总是", "突然", "本来", "朋友推荐的", "用了好几年", "晚上", "通勤路上", "新版本",
+    "首页", "歌单", "搜索", "评论区", "客服", "手机上", "平板上",
+)
+PUNCTUATION = ("，", "。", "！", "？", "…", "~", "!", " ", "")
+EMOJI = ("😀", "😡", "👍", "🔥", "😭", "🙏")
+
+# 无效数据样本：过短、纯数字符号、乱码
+GARBAGE = (
+    "", " ", "1", "好", "666", "123456789", "!!!", "。。。", "???", "###***",
+    "asdfghjklqwerty", "aaaaaaaaaaaaaaa", "hello world hello", "加我vx12345678",
+)
+
+
+class CorpusGenerator:
+    """可复现的合成评论生成器"""
+
+    def __init__(self, seed: int = 1, category_mix=DEFAULT_CATEGORY_MIX, mean_length: int = 24,
+                 invalid_rate: float = 0.05, duplicate_rate: float = 0.1, near_duplicate_ratio: float = 0.5,
+                 rules: Optional[RuleSet] = None, recent_pool: int = 10000):
+        self.seed = seed
+        self.rules = rules or CommentAnalyzer().rules
+        self.categories = self.rules.categories
+        if len(category_mix) != len(self.categories):
+            raise ValueError(f"category_mix 需要 {len(self.categories)} 个占比")
+        self.category_mix = tuple(category_mix)
+        self.mean_length = mean_length
+        self.invalid_rate = invalid_rate
+        self.duplicate_rate = duplicate_rate
+        # 重复评论中带扰动（标点、表情）的近重复比例
+        self.near_duplicate_ratio = near_duplicate_ratio
+        # 重复评论从最近生成的评论中抽取，保证内存有界
+        self.recent_pool = recent_pool
+        self._sentiment_keywords = [kws for _, kws in self.rules.sentiment_levels]
+        self._urgency_keywords = [kws for _, kws in self.rules.urgency_levels]
+
+    def params(self) -> Dict:
+        """生成参数（写入基准结果，便于复现）"""
+        return {
+            "seed": self.seed,
+            "category_mix": list(self.category_mix),
+            "mean_length": self.mean_length,
+            "invalid_rate": self.invalid_rate,
+            "duplicate_rate": self.duplicate_rate,
+            "near_duplicate_ratio": self.near_duplicate_ratio,
+            "rules": self.rules.fingerprint[:12],
+        }
+
+    def generate(self, rows: int) -> Iterator[str]:
+        """逐条生成 rows 条评论"""
+        rng = random.Random(self.seed)
+        recent: deque = deque(maxlen=self.recent_pool)
+        for _ in range(rows):
+            r = rng.random()
+            if r < self.invalid_rate:
+                comment = rng.choice(GARBAGE)
+            elif r < self.invalid_rate + self.duplicate_rate and recent:
+                comment = recent[rng.randrange(len(recent))]
+                if rng.random() < self.near_duplicate_ratio:
+                    comment = self._perturb(rng, comment)
+            else:
+                comment = self._compose(rng)
+                recent.append(comment)
+            yield comment
+
+    def take(self, rows: int) -> List[str]:
+        """生成 rows 条评论的列表"""
+        return list(self.generate(rows))
+
+    def _target_length(self, rng: random.Random) -> int:
+        # 评论长度近似对数正态分布：多数为短评，少量长评
+        length = int(rng.lognormvariate(math.log(self.mean_length), 0.6))
+        return max(4, min(length, 500))
+
+    def _compose(self, rng: random.Random) -> str:
+        """按分类占比组合关键词、情感词、紧迫度词和填充短语"""
+        _, keywords = rng.choices(self.categories, weights=self.category_mix)[0]
+        target = self._target_length(rng)
+        parts: List[str] = []
+        if keywords:
+            parts.append(rng.choice(keywords))
+        if rng.random() < 0.6:
+            parts.append(rng.choice(rng.choice(self._sentiment_keywords)))
+        if rng.random() < 0.5:
+            parts.append(rng.choice(rng.choice(self._urgency_keywords)))
+
+        length = sum(len(part) for part in parts)
+        while length < target:
+            part = rng.choice(FILLER)
+            parts.append(part)
+            length += len(part)
+        rng.shuffle(parts)
+
+        pieces = []
+        for part in parts:
+            pieces.append(part)
+            if rng.random() < 0.3:
+                pieces.append(rng.choice(PUNCTUATION))
+        if rng.random() < 0.1:
+            pieces.append(rng.choice(EMOJI))
+        return "".join(pieces)
+
+    def _perturb(self, rng: random.Random, comment: str) -> str:
+        """近重复：追加或插入标点、表情"""
+        extra = rng.choice(PUNCTUATION + EMOJI)
+        if rng.random() < 0.5 or not comment:
+            return comment + extra
+        position = rng.randrange(len(comment))
+        return comment[:position] + extra + comment[position:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成评论语料（每行一条）")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--invalid-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--mean-length", type=int, default=24)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.seed, mean_length=args.mean_length,
+                                invalid_rate=args.invalid_rate, duplicate_rate=args.duplicate_rate)
+    write = sys.stdout.write
+    for comment in generator.generate(args.rows):
+        write(comment)
+        write("\n")
+
+
+if __name__ == "__main__":
+    main()
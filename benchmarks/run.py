@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析流水线基准测试
+在合成语料上分别计时规范化、关键词扫描、分类、情感、紧迫度、槽点提取、统计聚合和报告生成，
+记录每秒处理条数与各环节峰值内存，结果保存为 JSON，可与历史结果对比
+
+    python -m benchmarks.run --rows 1000000 --output bench.json
+    python -m benchmarks.run --rows 1000000 --compare bench.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+
+from benchmarks.corpus import CorpusGenerator
+from comment_analyzer import CommentAnalyzer, REPORT_SEPARATOR
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+# 对比时速度变化超过该比例才标记
+SIGNIFICANT_CHANGE = 0.05
+
+
+def reset_peak_rss() -> bool:
+    """把峰值常驻内存重置为当前值（Linux 写 /proc/self/clear_refs），之后读到的即为此后的峰值；不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """峰值常驻内存（MB）：自上次 reset_peak_rss 起，未重置时为进程生命周期内的峰值；平台不支持时为 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def git_revision() -> Optional[str]:
+    """当前代码版本（不在 git 仓库中时为 None）"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _NullSink(io.TextIOBase):
+    """丢弃写入内容的文本流，只统计字符数"""
+
+    def __init__(self):
+        self.chars = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.chars += len(text)
+        return len(text)
+
+
+class StageTimer:
+    """累计各环节耗时、处理条数与峰值内存
+
+    支持重置峰值（Linux）时，每次执行前重置，记录的 peak_rss_mb 是该环节执行期间的峰值；
+    否则只能记录到当时为止的进程峰值，字段名为 process_peak_rss_mb 以示区别。
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+        self.per_stage_peak = reset_peak_rss()
+        self.peak_field = "peak_rss_mb" if self.per_stage_peak else "process_peak_rss_mb"
+
+    def run(self, name: str, count: int, fn: Callable):
+        """执行并计时 fn()，count 为本次处理的评论条数"""
+        if self.per_stage_peak:
+            reset_peak_rss()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "comments": 0, self.peak_field: None})
+        stage["seconds"] += elapsed
+        stage["comments"] += count
+        # 同一环节分多块执行时取各次峰值的最大值
+        if peak is not None and (stage[self.peak_field] is None or peak > stage[self.peak_field]):
+            stage[self.peak_field] = peak
+        return result
+
+    def results(self) -> Dict[str, Dict]:
+        for stage in self.stages.values():
+            stage["seconds"] = round(stage["seconds"], 4)
+            stage["comments_per_sec"] = round(stage["comments"] / stage["seconds"]) if stage["seconds"] else None
+        return self.stages
+
+
+def _blocks(comments: Iterator[str], block_size: int) -> Iterator[List[str]]:
+    while True:
+        block = list(islice(comments, block_size))
+        if not block:
+            return
+        yield block
+
+
+def _time_block(timer: StageTimer, analyzer: CommentAnalyzer, block: List[str]):
+    """逐环节计时一块评论；后面的环节复用前面环节的结果，只计本环节的开销"""
+    count = len(block)
+    normalized = timer.run("normalize", count, lambda: [analyzer.normalize(c) for c in block])
+    hits = timer.run("scan", count, lambda: [analyzer.scan(n) for n in normalized])
+    categories = timer.run("classify", count, lambda: [analyzer.classify(n, h) for n, h in zip(normalized, hits)])
+    timer.run("score_sentiment", count,
+              lambda: [analyzer.score_sentiment(n, h) for n, h in zip(normalized, hits)])
+    timer.run("determine_urgency", count,
+              lambda: [analyzer.determine_urgency(n, c, h) for n, c, h in zip(normalized, categories, hits)])
+    timer.run("extract_core_issue", count,
+              lambda: [analyzer.extract_core_issue(n, c, h) for n, c, h in zip(normalized, categories, hits)])
+    # 端到端：每条评论规范化、扫描一次后依次经过各环节
+    timer.run("analyze_batch", count, lambda: analyzer.analyze_batch(block))
+
+
+def _render_report(analyzer: CommentAnalyzer) -> str:
+    """只渲染报告（generate_report 会先重新分析全部评论）"""
+    buffer = io.StringIO()
+    analyzer.write_summary_table(buffer)
+    buffer.write(REPORT_SEPARATOR)
+    analyzer.write_detail_table(buffer)
+    return buffer.getvalue()
+
+
+def run_benchmark(rows: int, seed: int = 1, block_size: int = 50000, report_rows: int = 200000,
+                  cache_size: int = 0, stream_report: bool = True,
+                  generator: Optional[CorpusGenerator] = None, dedupe: bool = True) -> Dict:
+    """运行基准测试，返回可写入 JSON 的结果"""
+    generator = generator or CorpusGenerator(seed)
+    # 默认关闭结果缓存，测得的是各环节本身的开销
+    analyzer = CommentAnalyzer(cache_size=cache_size)
+    timer = StageTimer()
+    started = time.perf_counter()
+
+    for block in _blocks(generator.generate(rows), block_size):
+        _time_block(timer, analyzer, block)
+
+    # 统计与报告生成需要保留全部结果，在前 report_rows 条上计时
+    report_comments = generator.take(min(rows, report_rows))
+    count = len(report_comments)
+    analyzer.add_comments(report_comments)
+    timer.run("analyze", count, analyzer.analyze)
+    timer.run("aggregate_statistics", count, analyzer.aggregate_statistics)
+    timer.run("generate_report", count, lambda: _render_report(analyzer))
+
+    dedupe_info = None
+    if dedupe:
+        # 近重复折叠：单独计时聚类，再端到端计时 analyze(dedupe=True)，与上面的 analyze 对比即为净收益
+        deduper = CommentAnalyzer(cache_size=cache_size, dedupe=True)
+        deduper.add_comments(report_comments)
+        timer.run("collapse", count, deduper.collapse_clusters)
+        timer.run("analyze_dedupe", count, deduper.analyze)
+        dedupe_info = deduper.dedupe_info
+        del deduper
+    del report_comments
+    analyzer.add_comments([])
+    analyzer.analysis_results = []
+
+    if stream_report:
+        # 全量语料流式分析并写出报告（明细经临时文件拼接），内存不随条数增长
+        timer.run("write_stream_report", rows,
+                  lambda: analyzer.write_stream_report(generator.generate(rows), _NullSink()))
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": rows,
+        "block_size": block_size,
+        "report_rows": min(rows, report_rows),
+        "cache_size": cache_size,
+        "corpus": generator.params(),
+        "total_seconds": round(time.perf_counter() - started, 2),
+        # 各环节执行前会重置峰值，这里只反映最后一个环节，整体峰值以各环节中的最大值为准
+        "peak_rss_mb": max((stage[timer.peak_field] for stage in timer.stages.values()
+                            if stage[timer.peak_field] is not None), default=None),
+        "dedupe": dedupe_info,
+        "stages": timer.results(),
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """逐环节对比两次结果的处理速度"""
+    lines = [f"对比基准：{baseline.get('revision') or '-'}（{baseline.get('rows')} 条）"
+             f" -> {current.get('revision') or '-'}（{current.get('rows')} 条）"]
+    for name, stage in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or not old.get("comments_per_sec") or not stage.get("comments_per_sec"):
+            lines.append(f"  {name:<22} {stage.get('comments_per_sec') or '-':>12} 条/秒  （无对比数据）")
+            continue
+        ratio = stage["comments_per_sec"] / old["comments_per_sec"]
+        mark = ""
+        if ratio > 1 + SIGNIFICANT_CHANGE:
+            mark = "  ↑ 提速"
+        elif ratio < 1 - SIGNIFICANT_CHANGE:
+            mark = "  ↓ 退化"
+        lines.append(f"  {name:<22} {old['comments_per_sec']:>12} -> {stage['comments_per_sec']:>12} 条/秒"
+                     f"  ×{ratio:.2f}{mark}")
+    return lines
+
+
+def _peak_text(stage: Dict) -> str:
+    if "peak_rss_mb" in stage:
+        return f"峰值 {stage['peak_rss_mb']} MB"
+    return f"进程峰值 {stage.get('process_peak_rss_mb')} MB"
+
+
+def format_results(results: Dict) -> List[str]:
+    """结果的文本表格"""
+    lines = [f"{results['rows']} 条评论，版本 {results['revision'] or '-'}，"
+             f"总耗时 {results['total_seconds']} 秒，峰值内存 {results['peak_rss_mb']} MB"]
+    for name, stage in results["stages"].items():
+        lines.append(f"  {name:<22} {stage['comments']:>10} 条  {stage['seconds']:>10.3f} 秒"
+                     f"  {stage['comments_per_sec'] or '-':>12} 条/秒  {_peak_text(stage)}")
+    stages = results["stages"]
+    if results.get("dedupe") and "analyze_dedupe" in stages and stages["analyze"]["seconds"]:
+        saving = 1 - stages["analyze_dedupe"]["seconds"] / stages["analyze"]["seconds"]
+        lines.append(f"近重复折叠：去重比例 {results['dedupe']['ratio']:.1%}，"
+                     f"analyze_dedupe 相对 analyze {'节省' if saving >= 0 else '多花'} {abs(saving):.1%} 时间")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评论分析流水线基准测试")
+    parser.add_argument("--rows", type=int, default=100000, help="语料条数（最多可到千万级）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--block-size", type=int, default=50000, help="逐环节计时时每块的条数")
+    parser.add_argument("--report-rows", type=int, default=200000, help="统计与报告生成计时使用的条数")
+    parser.add_argument("--cache-size", type=int, default=0, help="分析器结果缓存大小（默认关闭）")
+    parser.add_argument("--invalid-rate", type=float, default=0.05)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--mean-length", type=int, default=24)
+    parser.add_argument("--no-stream-report", action="store_true", help="跳过全量流式报告计时")
+    parser.add_argument("--no-dedupe", action="store_true", help="跳过近重复折叠计时")
+    parser.add_argument("--output", help="结果 JSON 的保存路径")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.seed, mean_length=args.mean_length,
+                                invalid_rate=args.invalid_rate, duplicate_rate=args.duplicate_rate)
+    results = run_benchmark(args.rows, args.seed, args.block_size, args.report_rows, args.cache_size,
+                            not args.no_stream_report, generator, not args.no_dedupe)
+    print("\n".join(format_results(results)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(results, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有界 LRU 缓存
+用于缓存单条评论的分析结果，并统计命中、未命中和淘汰次数；可按条数和字节预算同时限制容量
+"""
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class LRUCache:
+    """最近最少使用淘汰的有界缓存"""
+
+    def __init__(self, maxsize: int = 10000, maxbytes: Optional[int] = None):
+        self.maxsize = maxsize
+        # 字节预算（None 表示只按条数限制），条目大小由 put 的调用方给出
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._sizes: Dict[Hashable, int] = {}
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """查询缓存，未命中返回 None"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object, nbytes: int = 0):
+        """写入缓存，超出容量时淘汰最久未使用的条目；单个条目超出字节预算时不缓存"""
+        if self.maxbytes is not None:
+            if nbytes > self.maxbytes:
+                return
+            self.nbytes += nbytes - self._sizes.get(key, 0)
+            self._sizes[key] = nbytes
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+            evicted, _ = self._data.popitem(last=False)
+            if self.maxbytes is not None:
+                self.nbytes -= self._sizes.pop(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存（计数器保留）"""
+        self._data.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> Dict:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "nbytes": self.nbytes,
+            "maxbytes": self.maxbytes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
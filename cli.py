@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行批量分析（voc-analyze）
+流式读取文件或标准输入中的评论，按所选格式输出报告、汇总或明细；输入较多时用全部 CPU 核心并行分析。
+不导入 Streamlit，pyarrow、openpyxl、多进程等模块只在用到时导入，适合 cron 与管道中频繁调用
+
+    ./voc-analyze comments.txt > report.md
+    cat comments.txt | ./voc-analyze -f jsonl | jq .category
+    ./voc-analyze reviews.csv --column 评论内容 -f parquet -o results.parquet
+"""
+
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import BrokenExecutor
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from aggregator import StatsAggregator
+from comment_analyzer import CommentAnalyzer
+from results import AnalysisResult
+
+OUTPUT_FORMATS = ("report", "summary", "csv", "jsonl", "arrow", "parquet")
+INPUT_FORMATS = ("auto", "txt", "csv", "xlsx")
+
+# 每块评论条数；输入不足两块时不启动进程池，直接在当前进程中分析
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _iter_chunks(comments: Iterator[str], chunk_size: int) -> Iterator[List[str]]:
+    while True:
+        chunk = list(islice(comments, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_results(analyzer: CommentAnalyzer, comments: Iterable[str], stats: StatsAggregator,
+                 jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[AnalysisResult]:
+    """流式分析评论并逐条产出结果（ID 从 1 起按输入顺序编号），统计量同步更新到 stats"""
+    comments = iter(comments)
+    if jobs <= 1:
+        yield from analyzer.analyze_stream(comments, stats)
+        return
+
+    chunks = _iter_chunks(comments, chunk_size)
+    head = list(islice(chunks, 2))
+    if len(head) < 2:
+        yield from analyzer.analyze_stream(chain.from_iterable(head), stats)
+        return
+
+    from parallel import iter_parallel
+
+    category_labels = analyzer.rules.category_labels
+    idx = 0
+    for chunk, codes in iter_parallel(analyzer, chain(head, chunks), jobs):
+        for comment, (category, sentiment, urgency, core_issue) in zip(chunk, codes):
+            idx += 1
+            stats.add(category, sentiment, urgency, core_issue)
+            yield AnalysisResult(idx, category, sentiment, urgency, core_issue, comment, category_labels)
+
+
+def _input_format(path: str, fmt: str) -> str:
+    if fmt != "auto":
+        return fmt
+    extension = path.rsplit(".", 1)[-1].lower() if "." in os.path.basename(path) else ""
+    return extension if extension in ("csv", "xlsx") else "txt"
+
+
+def _iter_lines(stream: TextIO) -> Iterator[str]:
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+def iter_input(paths: List[str], fmt: str = "auto", column: Optional[str] = None) -> Iterator[str]:
+    """依次读取各输入（"-" 为标准输入）中的评论：纯文本每行一条，CSV/XLSX 取评论列"""
+    for path in paths:
+        if path == "-":
+            yield from _iter_lines(io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", errors="replace"))
+            continue
+        path_format = _input_format(path, fmt)
+        if path_format == "txt":
+            with open(path, encoding="utf-8-sig", errors="replace") as f:
+                yield from _iter_lines(f)
+            continue
+
+        from ingest import CommentSource, guess_comment_column
+
+        with open(path, "rb") as f:
+            source = CommentSource(f, fmt=path_format)
+            columns = source.columns()
+            if column is None:
+                index = guess_comment_column(columns)
+            elif column in columns:
+                index = columns.index(column)
+            elif column.isdigit() and 0 < int(column) <= len(columns):
+                index = int(column) - 1
+            else:
+                raise ValueError(f"{path} 中没有列：{column}（可选 {', '.join(columns)}）")
+            yield from source.iter_comments(index)
+
+
+def _write_text(analyzer: CommentAnalyzer, results: Iterable[AnalysisResult], stats: StatsAggregator,
+                fmt: str, sink: TextIO):
+    if fmt == "report":
+        analyzer.write_results_report(results, stats, sink)
+        sink.write("\n")
+    elif fmt == "summary":
+        for _ in results:
+            pass
+        analyzer.write_summary_table(sink, stats.summary())
+        sink.write("\n")
+    else:
+        import exporters
+        exporters.WRITERS[fmt](results, sink)
+
+
+def write_output(analyzer: CommentAnalyzer, results: Iterable[AnalysisResult], stats: StatsAggregator,
+                 fmt: str, output: Optional[str] = None):
+    """按格式写出结果；output 为 None 时写到标准输出（始终为 UTF-8）"""
+    if fmt in ("arrow", "parquet"):
+        import exporters
+        exporters.WRITERS[fmt](results, output if output is not None else sys.stdout.buffer)
+        return
+    if output is not None:
+        with open(output, "w", encoding="utf-8", newline="") as sink:
+            _write_text(analyzer, results, stats, fmt, sink)
+        return
+
+    sink = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+    try:
+        _write_text(analyzer, results, stats, fmt, sink)
+    finally:
+        sink.flush()
+        # 解除包装，避免关闭标准输出
+        sink.detach()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="voc-analyze", description="批量分析用户评论：归类、情感打分、紧迫度定级，输出报告或明细"
+    )
+    parser.add_argument("inputs", nargs="*", metavar="FILE", help="输入文件（txt/csv/xlsx），省略或 - 表示标准输入")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="report",
+                        help="输出格式：完整报告、仅汇总表或明细（csv/jsonl/arrow/parquet），默认 report")
+    parser.add_argument("-o", "--output", help="输出文件，默认写到标准输出")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，默认为 CPU 核心数；1 表示不并行")
+    parser.add_argument("--rules", help="规则包（JSON/TOML）路径，默认使用内置规则")
+    parser.add_argument("--input-format", choices=INPUT_FORMATS, default="auto",
+                        help="输入格式，默认按扩展名判断（标准输入按纯文本）")
+    parser.add_argument("--column", help="CSV/XLSX 中评论所在列（列名或从 1 起的序号），默认按列名猜测")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="并行分析时每块的评论条数")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size 必须大于 0")
+    for path in args.inputs:
+        if path != "-" and not os.path.isfile(path):
+            parser.error(f"找不到输入文件：{path}")
+
+    try:
+        # 规则包读取或校验失败（文件不存在、格式错误、缺少兜底分类等）同样以错误信息退出
+        analyzer = CommentAnalyzer.from_rule_pack(args.rules) if args.rules else CommentAnalyzer()
+        stats = StatsAggregator(analyzer.rules.category_labels)
+        comments = iter_input(args.inputs or ["-"], args.input_format, args.column)
+        results = iter_results(analyzer, comments, stats, args.jobs, args.chunk_size)
+        write_output(analyzer, results, stats, args.format, args.output)
+    except BrokenPipeError:
+        # 下游（如 head）提前关闭管道：静默退出，避免解释器退出时再次报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except (ValueError, ImportError, OSError) as e:
+        print(f"voc-analyze: {e}", file=sys.stderr)
+        return 1
+    except BrokenExecutor as e:
+        # 并行分析的工作进程异常退出（BrokenProcessPool）
+        print(f"voc-analyze: 并行分析的工作进程异常退出：{e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
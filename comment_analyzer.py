@@ -5,9 +5,57 @@
 用于分析用户评论，进行归类、打分、定级，并生成统计报告
 """
 
-import re
-from typing import List, Dict, Tuple, Optional
-from collections import defaultdict
+import io
+import time
+from contextlib import nullcontext
+from typing import (
+    List, Dict, Tuple, Optional, Sequence, Iterable, Iterator, Union, TextIO,
+    AsyncIterable, AsyncIterator, Awaitable, TYPE_CHECKING
+)
+
+from aggregator import StatsAggregator
+from cache import LRUCache
+from normalize import CJK_PATTERN, NormalizedComment, normalize
+from results import (
+    AnalysisResult, BatchResult, CommentRecord, INVALID_CATEGORY, INVALID_CATEGORY_CODE, SENTIMENTS,
+    URGENCIES, Sentiment, Urgency
+)
+from rules import RuleSet, compile_rules, load_rule_pack, tables_from_analyzer
+
+# 近重复折叠、指标、执行器等只在用到时导入，保持命令行启动迅速
+if TYPE_CHECKING:
+    from alerts import SpikeDetector
+    from concurrent.futures import Executor
+    from cube import StatsCube
+    from metrics import PipelineMetrics
+
+
+# 报告中汇总表与明细表之间的分隔
+REPORT_SEPARATOR = "\n\n---\n\n"
+
+# 各分析环节既接受原始评论，也接受已规范化的评论
+CommentText = Union[str, NormalizedComment]
+
+# Markdown 表格单元格中会破坏表格结构的字符：竖线转义，换行替换为空格
+_MARKDOWN_CELL_ESCAPES = str.maketrans({"|": "\\|", "\r": " ", "\n": " "})
+
+
+def _markdown_cell(text: str) -> str:
+    """转义 Markdown 表格单元格（绝大多数文本不含特殊字符，原样返回）"""
+    if "|" in text or "\n" in text or "\r" in text:
+        return text.translate(_MARKDOWN_CELL_ESCAPES)
+    return text
+
+
+def _cjk_prefix(text: str) -> Tuple[List[int], List[str]]:
+    """汉字前缀和：prefix[k] 为 text[:k] 中的汉字数，同时返回按顺序排列的汉字"""
+    prefix = [0]
+    chinese_chars = []
+    for char in text:
+        if '\u4e00' <= char <= '\u9fff':
+            chinese_chars.append(char)
+        prefix.append(len(chinese_chars))
+    return prefix, chinese_chars
 
 
 class CommentAnalyzer:
@@ -52,65 +100,141 @@ class CommentAnalyzer:
         "P2": ["建议", "希望", "可以", "改进", "优化", "更好"]
     }
     
-    def __init__(self):
+    # 未找到关键词时的默认槽点（3-4字）
+    DEFAULT_ISSUES = {
+        "1-功能稳定性": "功能问题",
+        "2-交互与体验UI/UX": "体验问题",
+        "3-商业化": "商业问题",
+        "4-内容版权": "版权问题",
+        "5-其他": "其他问题"
+    }
+    
+    def __init__(self, rules: Optional[RuleSet] = None, cache_size: int = 10000, dedupe: bool = False):
         self.comments = []
         self.analysis_results = []
+        self.stream_stats: Optional[StatsAggregator] = None
+        # 近重复折叠（可替换为自定义参数的 NearDuplicateCollapser）
+        self.deduplicator = None
+        if dedupe:
+            from dedupe import NearDuplicateCollapser
+            self.deduplicator = NearDuplicateCollapser()
+        self.dedupe_info: Optional[Dict] = None
+        # 单条评论结果缓存（cache_size 为 0 时关闭）
+        self.cache = LRUCache(cache_size) if cache_size > 0 else None
+        # 流水线指标（enable_metrics 开启，未开启时为 None，不产生开销）
+        self.metrics: Optional["PipelineMetrics"] = None
+        # 未指定规则包时，使用类属性中的内置规则
+        self.rules = rules or compile_rules(tables_from_analyzer(type(self)))
+    
+    @property
+    def rules(self) -> RuleSet:
+        """当前使用的规则集"""
+        return self._rules
+    
+    @rules.setter
+    def rules(self, rules: RuleSet):
+        # 规则变化后缓存的结果不再有效
+        self._rules = rules
+        if self.cache is not None:
+            self.cache.clear()
+    
+    def cache_info(self) -> Dict:
+        """结果缓存的命中、未命中、淘汰统计"""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 0, "hit_rate": 0.0}
+        return self.cache.info()
+    
+    def enable_metrics(self, metrics: Optional["PipelineMetrics"] = None, **options) -> "PipelineMetrics":
+        """开启流水线指标（各环节耗时、延迟直方图、关键词命中、慢评论、可选内存快照），返回指标对象"""
+        from metrics import PipelineMetrics
+        self.metrics = metrics or PipelineMetrics(**options)
+        return self.metrics
+    
+    def disable_metrics(self):
+        """关闭流水线指标"""
+        self.metrics = None
+    
+    def _timed(self, stage: str):
+        """开启指标时计时 with 语句块，否则不做任何事"""
+        return self.metrics.timer(stage) if self.metrics is not None else nullcontext()
+    
+    @classmethod
+    def from_rule_pack(cls, path: str, cache_dir: Optional[str] = None) -> "CommentAnalyzer":
+        """从 JSON/TOML 规则包创建分析器"""
+        return cls(load_rule_pack(path, cache_dir))
+    
+    def normalize(self, comment: CommentText) -> NormalizedComment:
+        """规范化评论（小写、全角转半角、汉字计数、有效性判断），各环节共享结果"""
+        return normalize(comment)
+    
+    def scan(self, comment: CommentText) -> Dict[str, int]:
+        """单次扫描评论，返回命中关键词及其首次出现位置"""
+        return self.rules.matcher.first_offsets(self.normalize(comment).lowered)
     
     def add_comments(self, comments: List[str]):
         """添加评论列表"""
         self.comments = comments
     
-    def classify(self, comment: str) -> str:
+    def classify(self, comment: CommentText, hits: Optional[Dict[str, int]] = None) -> str:
         """对评论进行分类"""
+        return self.rules.category_labels[self.classify_code(comment, hits)]
+    
+    def classify_code(self, comment: CommentText, hits: Optional[Dict[str, int]] = None) -> int:
+        """对评论进行分类，返回分类编码（0 为无效数据）"""
+        comment = self.normalize(comment)
         # 检查无效数据
-        if self._is_invalid(comment):
-            return "无效数据"
-        
-        comment_lower = comment.lower()
-        category_scores = {}
-        
-        for category, keywords in self.CATEGORY_KEYWORDS.items():
-            if category == "5-其他":
-                continue  # 其他类别最后处理
-            score = sum(1 for keyword in keywords if keyword in comment_lower)
-            if score > 0:
-                category_scores[category] = score
+        if comment.invalid:
+            return INVALID_CATEGORY_CODE
+        
+        if hits is None:
+            hits = self.scan(comment)
+        # 只遍历命中的关键词累计各分类得分
+        category_scores: Dict[int, int] = {}
+        keyword_categories = self.rules.keyword_categories
+        for keyword in hits:
+            for code in keyword_categories.get(keyword, ()):
+                category_scores[code] = category_scores.get(code, 0) + 1
         
         # 如果没有匹配到具体分类，归为"5-其他"
         if not category_scores:
-            return "5-其他"
+            return self.rules.category_codes[self.rules.fallback_category]
         
-        # 返回得分最高的分类，如果得分相同，按优先级返回（序号小的优先）
+        # 返回得分最高的分类，如果得分相同，按优先级返回（序号小的优先，再按规则包中的顺序）
         if len(category_scores) == 1:
-            return list(category_scores.keys())[0]
+            return next(iter(category_scores))
         
         max_score = max(category_scores.values())
-        top_categories = [cat for cat, score in category_scores.items() if score == max_score]
+        top_categories = [code for code, score in category_scores.items() if score == max_score]
         
         # 如果多个分类得分相同，选择序号最小的
         if len(top_categories) > 1:
-            return min(top_categories, key=lambda x: int(x.split('-')[0]))
+            labels, rank = self.rules.category_labels, self.rules.category_rank
+            return min(top_categories, key=lambda code: (rank[labels[code]], code))
         
         return top_categories[0]
     
-    def score_sentiment(self, comment: str) -> str:
+    def score_sentiment(self, comment: CommentText, hits: Optional[Dict[str, int]] = None) -> str:
         """对评论进行情感打分"""
-        if self._is_invalid(comment):
-            return "N/A"
+        return self.sentiment_code(comment, hits).label
+    
+    def sentiment_code(self, comment: CommentText, hits: Optional[Dict[str, int]] = None) -> Sentiment:
+        """对评论进行情感打分，返回情感编码"""
+        comment = self.normalize(comment)
+        if comment.invalid:
+            return Sentiment.NA
         
-        comment_lower = comment.lower()
-        sentiment_matches = []
+        if hits is None:
+            hits = self.scan(comment)
+        sentiment_matches = set()
         
-        # 检查每个情感等级的关键词
-        for score, keywords in sorted(self.SENTIMENT_KEYWORDS.items()):
-            for keyword in keywords:
-                if keyword in comment_lower:
-                    sentiment_matches.append(score)
-                    break  # 找到匹配就跳出，避免重复
+        # 收集命中关键词对应的情感等级
+        keyword_sentiments = self.rules.keyword_sentiments
+        for keyword in hits:
+            sentiment_matches.update(keyword_sentiments.get(keyword, ()))
         
         if not sentiment_matches:
             # 默认中立
-            return "3分（中立）"
+            return Sentiment.NEUTRAL
         
         # 优先选择最低分（更强烈的负面情绪）或最高分（更强烈的正面情绪）
         # 如果有1分或2分，优先选择最低分；否则选择最高分
@@ -119,266 +243,403 @@ class CommentAnalyzer:
         else:
             final_score = max(sentiment_matches)
         
-        sentiment_map = {
-            1: "1分（愤怒）",
-            2: "2分（不满）",
-            3: "3分（中立）",
-            4: "4分（满意）",
-            5: "5分（惊喜）"
-        }
-        
-        return sentiment_map[final_score]
+        return SENTIMENTS[final_score]
     
-    def determine_urgency(self, comment: str, category: str) -> str:
+    def determine_urgency(self, comment: CommentText, category: str, hits: Optional[Dict[str, int]] = None) -> str:
         """判断评论的紧迫度"""
-        if category == "无效数据":
-            return "N/A"
-        
-        comment_lower = comment.lower()
-        
-        # 检查P0关键词
-        for keyword in self.URGENCY_KEYWORDS["P0"]:
-            if keyword in comment_lower:
-                return "P0（高危）"
+        return self.urgency_code(comment, self.rules.category_codes[category], hits).label
+    
+    def urgency_code(self, comment: CommentText, category: int, hits: Optional[Dict[str, int]] = None) -> Urgency:
+        """判断评论的紧迫度，返回紧迫度编码（category 为分类编码）"""
+        if category == INVALID_CATEGORY_CODE:
+            return Urgency.NA
         
-        # 检查P1关键词
-        for keyword in self.URGENCY_KEYWORDS["P1"]:
-            if keyword in comment_lower:
-                return "P1（重要）"
+        if hits is None:
+            hits = self.scan(comment)
         
-        # 检查P2关键词
-        for keyword in self.URGENCY_KEYWORDS["P2"]:
-            if keyword in comment_lower:
-                return "P2（一般）"
+        # 取命中关键词中最紧急的等级（P0 > P1 > P2）
+        keyword_urgency = self.rules.keyword_urgency
+        level = min((keyword_urgency[keyword] for keyword in hits if keyword in keyword_urgency), default=None)
+        if level is not None:
+            return URGENCIES[level]
         
         # 默认P2
-        return "P2（一般）"
+        return Urgency.P2
     
     def _count_chinese_chars(self, text: str) -> int:
         """计算中文字符数量"""
-        return len(re.findall(r'[\u4e00-\u9fff]', text))
+        return len(CJK_PATTERN.findall(text))
     
-    def extract_core_issue(self, comment: str, category: str) -> str:
+    def extract_core_issue(self, comment: CommentText, category: str, hits: Optional[Dict[str, int]] = None) -> str:
         """提取核心槽点（3-5字）"""
-        if category == "无效数据":
-            return "无效数据"
-        
-        # 根据分类提取关键词
-        category_keywords = self.CATEGORY_KEYWORDS.get(category, [])
-        comment_lower = comment.lower()
-        
-        # 优先查找短关键词（2-3字），更容易匹配到3-5字的短语
-        sorted_keywords = sorted(category_keywords, key=lambda x: len(x))
-        
-        for keyword in sorted_keywords:
-            if keyword in comment_lower:
-                idx = comment_lower.find(keyword)
-                # 尝试提取包含关键词的短语（3-5字）
-                # 向前扩展最多2个字符，向后扩展最多2个字符
-                for start_offset in range(2, -1, -1):
-                    for end_offset in range(0, 3):
-                        start = max(0, idx - start_offset)
-                        end = min(len(comment), idx + len(keyword) + end_offset)
-                        phrase = comment[start:end].strip()
-                        
-                        # 只计算中文字符数量
-                        chinese_count = self._count_chinese_chars(phrase)
-                        if 3 <= chinese_count <= 5:
-                            # 提取纯中文部分
-                            chinese_chars = re.findall(r'[\u4e00-\u9fff]', phrase)
-                            if len(chinese_chars) >= 3:
-                                return ''.join(chinese_chars[:5])
-                
-                # 如果关键词本身在3-5字范围内，直接返回
-                chinese_keyword = ''.join(re.findall(r'[\u4e00-\u9fff]', keyword))
-                if 3 <= len(chinese_keyword) <= 5:
-                    return chinese_keyword
-                elif len(chinese_keyword) == 2:
-                    # 2字关键词，尝试前后各加一个字
-                    if idx > 0 and idx + len(keyword) < len(comment):
-                        extended = comment[max(0, idx-1):min(len(comment), idx+len(keyword)+1)]
-                        chinese_extended = ''.join(re.findall(r'[\u4e00-\u9fff]', extended))
-                        if 3 <= len(chinese_extended) <= 5:
-                            return chinese_extended
-                elif len(chinese_keyword) > 5:
-                    # 长关键词，取前5字
-                    return chinese_keyword[:5]
+        return self.core_issue(comment, self.rules.category_codes[category], hits)
+    
+    def core_issue(self, comment: CommentText, category: int, hits: Optional[Dict[str, int]] = None) -> str:
+        """提取核心槽点（3-5字），category 为分类编码"""
+        if category == INVALID_CATEGORY_CODE:
+            return INVALID_CATEGORY
+        
+        if hits is None:
+            hits = self.scan(comment)
+        if isinstance(comment, NormalizedComment):
+            comment = comment.original
+        category_label = self.rules.category_labels[category]
+        
+        # 根据分类提取关键词：只取命中的关键词
+        # 优先查找短关键词（2-3字），更容易匹配到3-5字的短语（编译规则时已记录长度排序的位置）
+        ranks = self.rules.issue_ranks.get(category, {})
+        sorted_keywords = sorted((ranks[keyword], keyword) for keyword in hits if keyword in ranks)
+        
+        keyword_cjk = self.rules.keyword_cjk
+        length = len(comment)
+        
+        for _, keyword in sorted_keywords:
+            idx = hits[keyword]
+            keyword_end = idx + len(keyword)
+            
+            # 关键词前后各2个字符范围内的汉字前缀和，每个候选短语的汉字数 O(1) 得出
+            base = min(max(0, idx - 2), length)
+            prefix, chinese_chars = _cjk_prefix(comment[base:min(length, keyword_end + 2)])
+            
+            # 尝试提取包含关键词的短语（3-5字）
+            # 向前扩展最多2个字符，向后扩展最多2个字符
+            for start_offset in range(2, -1, -1):
+                start = prefix[min(max(0, idx - start_offset), length) - base]
+                for end_offset in range(0, 3):
+                    end = prefix[min(length, keyword_end + end_offset) - base]
+                    
+                    # 只计算中文字符数量
+                    if 3 <= end - start <= 5:
+                        return ''.join(chinese_chars[start:end])
+            
+            # 如果关键词本身在3-5字范围内，直接返回
+            chinese_keyword = keyword_cjk[keyword]
+            if 3 <= len(chinese_keyword) <= 5:
+                return chinese_keyword
+            elif len(chinese_keyword) == 2:
+                # 2字关键词，尝试前后各加一个字
+                if idx > 0 and keyword_end < length:
+                    start = prefix[max(0, idx - 1) - base]
+                    end = prefix[min(length, keyword_end + 1) - base]
+                    if 3 <= end - start <= 5:
+                        return ''.join(chinese_chars[start:end])
+            elif len(chinese_keyword) > 5:
+                # 长关键词，取前5字
+                return chinese_keyword[:5]
         
         # 如果没找到，根据分类返回简短描述（3-4字）
-        defaults = {
-            "1-功能稳定性": "功能问题",
-            "2-交互与体验UI/UX": "体验问题",
-            "3-商业化": "商业问题",
-            "4-内容版权": "版权问题",
-            "5-其他": "其他问题"
-        }
-        return defaults.get(category, "其他问题")
+        return self.rules.default_issues.get(category_label, "其他问题")
     
-    def _is_invalid(self, comment: str) -> bool:
+    def _is_invalid(self, comment: CommentText) -> bool:
         """判断是否为无效数据（无意义、广告、纯社交请求）"""
-        comment = comment.strip()
-        
-        # 空评论或过短
-        if len(comment) < 2:
-            return True
-        
-        # 纯乱码（大部分非中文字符）
-        non_chinese = len(re.sub(r'[\u4e00-\u9fff]', '', comment))
-        if non_chinese / len(comment) > 0.7 and len(comment) > 10:
-            return True
-        
-        # 纯数字或符号
-        if re.match(r'^[\d\s\W]+$', comment):
-            return True
-        
-        return False
+        return self.normalize(comment).invalid
     
-    def analyze(self) -> List[Dict]:
+    def analyze(self) -> List[AnalysisResult]:
         """分析所有评论"""
         self.analysis_results = []
-        
-        for idx, comment in enumerate(self.comments, 1):
-            category = self.classify(comment)
-            sentiment = self.score_sentiment(comment)
-            urgency = self.determine_urgency(comment, category)
-            core_issue = self.extract_core_issue(comment, category)
-            summary = comment[:10] if len(comment) >= 10 else comment
-            
-            result = {
-                "id": idx,
-                "category": category,
-                "sentiment": sentiment,
-                "urgency": urgency,
-                "core_issue": core_issue,
-                "summary": summary,
-                "original": comment
-            }
-            
-            self.analysis_results.append(result)
+        clusters = self.collapse_clusters()
+        
+        category_labels = self.rules.category_labels
+        positions = [position for position, _ in clusters] if clusters is not None else range(len(self.comments))
+        for n, position in enumerate(positions):
+            comment = self.comments[position]
+            category, sentiment, urgency, core_issue = self.analyze_codes(comment)
+            weight = clusters[n][1] if clusters is not None else None
+            self.analysis_results.append(
+                AnalysisResult(position + 1, category, sentiment, urgency, core_issue, comment, category_labels, weight)
+            )
         
         return self.analysis_results
     
+    def collapse_clusters(self) -> Optional[List[Tuple[int, int]]]:
+        """开启近重复折叠时聚类 self.comments，返回 [(代表评论位置, 簇大小)] 并更新 dedupe_info；未开启时返回 None"""
+        if self.deduplicator is None:
+            self.dedupe_info = None
+            return None
+        
+        # 每个近重复簇只分析代表评论，簇大小记入 weight
+        clusters = self.deduplicator.collapse(self.comments)
+        self.dedupe_info = {
+            "total": len(self.comments),
+            "unique": len(clusters),
+            "ratio": round(1 - len(clusters) / len(self.comments), 4) if self.comments else 0.0
+        }
+        return clusters
+    
+    def analyze_codes(self, comment: str) -> Tuple[int, Sentiment, Urgency, str]:
+        """分析单条评论，返回 (分类编码, 情感编码, 紧迫度编码, 核心槽点)"""
+        if self.metrics is not None:
+            return self._analyze_codes_measured(comment)
+        cache = self.cache
+        if cache is not None:
+            cached = cache.get(comment)
+            if cached is not None:
+                return cached
+        
+        # 每条评论只规范化、扫描一次，各环节共享结果
+        normalized = self.normalize(comment)
+        hits = self.scan(normalized)
+        category = self.classify_code(normalized, hits)
+        codes = (
+            category,
+            self.sentiment_code(normalized, hits),
+            self.urgency_code(normalized, category, hits),
+            self.core_issue(normalized, category, hits)
+        )
+        
+        if cache is not None:
+            cache.put(comment, codes)
+        return codes
+    
+    def _analyze_codes_measured(self, comment: str) -> Tuple[int, Sentiment, Urgency, str]:
+        """analyze_codes 的计时版本（开启指标时使用），结果完全相同"""
+        metrics = self.metrics
+        clock = time.perf_counter
+        start = clock()
+        cache = self.cache
+        if cache is not None:
+            cached = cache.get(comment)
+            if cached is not None:
+                elapsed = clock() - start
+                # 命中缓存的评论同样计入关键词命中数：在计时之外重新扫描一次（仅开启指标时）
+                metrics.record_cache_hit(comment, elapsed, self.scan(self.normalize(comment)))
+                return cached
+        
+        t0 = clock()
+        normalized = self.normalize(comment)
+        t1 = clock()
+        hits = self.scan(normalized)
+        t2 = clock()
+        category = self.classify_code(normalized, hits)
+        t3 = clock()
+        sentiment = self.sentiment_code(normalized, hits)
+        t4 = clock()
+        urgency = self.urgency_code(normalized, category, hits)
+        t5 = clock()
+        core_issue = self.core_issue(normalized, category, hits)
+        t6 = clock()
+        codes = (category, sentiment, urgency, core_issue)
+        
+        if cache is not None:
+            cache.put(comment, codes)
+        metrics.record_comment(comment, t6 - start, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5), hits)
+        return codes
+    
+    def analyze_batch(self, comments: Sequence[str]) -> BatchResult:
+        """批量分析评论，返回列式结果（不写入 analysis_results）"""
+        batch = BatchResult(comments, self.rules.category_labels)
+        for position, comment in enumerate(comments):
+            batch.append(position, *self.analyze_codes(comment))
+        return batch
+    
+    def extend_batch(self, batch: BatchResult, comments: Iterable[str]) -> BatchResult:
+        """分析新的一块评论并追加到已有列式结果（batch.comments 需为列表），ID 接续已有评论"""
+        start = len(batch.comments)
+        batch.comments.extend(comments)
+        for position in range(start, len(batch.comments)):
+            batch.append(position, *self.analyze_codes(batch.comments[position]))
+        return batch
+    
+    def analyze_parallel(self, comments: Sequence[str], workers: Optional[int] = None,
+                         chunk_size: int = 5000) -> BatchResult:
+        """多进程并行分析，返回列式结果，ID 与顺序分析一致"""
+        from parallel import analyze_parallel
+        return analyze_parallel(self, comments, workers, chunk_size)
+    
+    def analyze_stream(self, comments: Iterable[str], stats: Optional[StatsAggregator] = None) -> Iterator[AnalysisResult]:
+        """流式分析评论，逐条产出结果，不保留历史结果
+        
+        comments 可以是文件对象或 sys.stdin（逐行读取，自动去掉行尾换行符）。
+        统计量随流实时更新到 self.stream_stats（或传入的 stats）中。
+        """
+        if stats is None:
+            stats = StatsAggregator(self.rules.category_labels)
+        self.stream_stats = stats
+        category_labels = self.rules.category_labels
+        
+        for idx, comment in enumerate(comments, 1):
+            comment = comment.rstrip('\r\n')
+            category, sentiment, urgency, core_issue = self.analyze_codes(comment)
+            stats.add(category, sentiment, urgency, core_issue)
+            yield AnalysisResult(idx, category, sentiment, urgency, core_issue, comment, category_labels)
+    
+    def analyze_records(self, records: Iterable[CommentRecord], cube: Optional["StatsCube"] = None,
+                        stats: Optional[StatsAggregator] = None,
+                        detector: Optional["SpikeDetector"] = None) -> Iterator[AnalysisResult]:
+        """流式分析带元数据的评论记录，逐条产出结果
+        
+        cube 不为空时按记录的时间、版本与平台同步更新多维统计立方体，
+        之后按时间范围切片或上卷都无需重新分析；detector 不为空时按记录时间检测评论激增。
+        """
+        if stats is None:
+            stats = StatsAggregator(self.rules.category_labels)
+        self.stream_stats = stats
+        category_labels = self.rules.category_labels
+        
+        for idx, record in enumerate(records, 1):
+            category, sentiment, urgency, core_issue = self.analyze_codes(record.text)
+            stats.add(category, sentiment, urgency, core_issue)
+            if cube is not None:
+                cube.add(record.timestamp, category, sentiment, urgency, record.version, record.platform)
+            if detector is not None:
+                detector.add(category, sentiment, urgency, core_issue, record.timestamp)
+            yield AnalysisResult(idx, category, sentiment, urgency, core_issue, record.text, category_labels)
+    
+    def new_cube(self, tz_offset: int = 0) -> "StatsCube":
+        """创建与当前规则集匹配的多维统计立方体"""
+        from cube import StatsCube
+        return StatsCube(self.rules.category_labels, tz_offset)
+    
+    def new_detector(self, **options) -> "SpikeDetector":
+        """创建与当前规则集匹配的评论激增检测器（参数见 SpikeDetector）"""
+        from alerts import SpikeDetector
+        return SpikeDetector(self.rules.category_labels, **options)
+    
+    def analyze_async(self, comments: Optional[List[str]] = None, executor: Optional["Executor"] = None,
+                      chunk_size: int = 1000, max_in_flight: int = 4) -> Awaitable[List[AnalysisResult]]:
+        """analyze 的异步版本（需 await）：按块卸载到执行器，结果写入 analysis_results
+        
+        传入 comments 时先替换评论列表；executor 为 None 时使用事件循环默认的线程池。
+        """
+        from async_analysis import analyze_async
+        return analyze_async(self, comments, executor, chunk_size, max_in_flight)
+    
+    def analyze_stream_async(self, comments: Union[Iterable[str], AsyncIterable[str]],
+                             stats: Optional[StatsAggregator] = None, executor: Optional["Executor"] = None,
+                             chunk_size: int = 1000, max_in_flight: int = 4) -> AsyncIterator[AnalysisResult]:
+        """analyze_stream 的异步版本（async for）：最多 max_in_flight 块同时分析，按输入顺序产出结果"""
+        from async_analysis import analyze_stream_async
+        return analyze_stream_async(self, comments, stats, executor, chunk_size, max_in_flight)
+    
     def aggregate_statistics(self) -> Dict:
         """聚合统计"""
-        stats = defaultdict(lambda: {
-            "count": 0,
-            "sentiments": [],
-            "urgencies": [],
-            "core_issues": [],
-            "comments": []
-        })
-        
-        for result in self.analysis_results:
-            category = result["category"]
-            if category == "无效数据":
-                continue
-            
-            stats[category]["count"] += 1
-            stats[category]["comments"].append(result)
-            
-            # 提取情感分数
-            sentiment_match = re.search(r'(\d)分', result["sentiment"])
-            if sentiment_match:
-                stats[category]["sentiments"].append(int(sentiment_match.group(1)))
-            
-            # 提取紧迫度
-            urgency_match = re.search(r'(P\d)', result["urgency"])
-            if urgency_match:
-                stats[category]["urgencies"].append(urgency_match.group(1))
-        
-        # 计算统计结果
-        aggregated = {}
-        for category, data in stats.items():
-            count = data["count"]
-            avg_sentiment = sum(data["sentiments"]) / len(data["sentiments"]) if data["sentiments"] else 0
-            avg_sentiment = round(avg_sentiment, 1)
-            
-            # 找出最高紧迫度
-            urgency_levels = {"P0": 0, "P1": 1, "P2": 2}
-            if data["urgencies"]:
-                highest_urgency = min(data["urgencies"], key=lambda x: urgency_levels.get(x, 99))
-                urgency_label = {
-                    "P0": "P0（高危）",
-                    "P1": "P1（重要）",
-                    "P2": "P2（一般）"
-                }.get(highest_urgency, "P2（一般）")
-            else:
-                highest_urgency = "P2"
-                urgency_label = "P2（一般）"
-            
-            # 找出典型槽点（最高紧迫度下的核心槽点）
-            typical_issue = "无"
-            if data["comments"]:
-                # 找出最高紧迫度的评论
-                highest_urgency_comments = [
-                    c for c in data["comments"] 
-                    if re.search(r'P0', c["urgency"]) and highest_urgency == "P0"
-                ]
-                if not highest_urgency_comments:
-                    highest_urgency_comments = [
-                        c for c in data["comments"]
-                        if re.search(r'P1', c["urgency"]) and highest_urgency == "P1"
-                    ]
-                if not highest_urgency_comments:
-                    highest_urgency_comments = data["comments"]
-                
-                if highest_urgency_comments:
-                    typical_issue = highest_urgency_comments[0]["core_issue"]
-            
-            aggregated[category] = {
-                "count": count,
-                "avg_sentiment": avg_sentiment,
-                "highest_urgency": urgency_label,
-                "typical_issue": typical_issue
-            }
+        stats = StatsAggregator(self.rules.category_labels)
+        
+        with self._timed("aggregate"):
+            for result in self.analysis_results:
+                stats.add(result.category, result.sentiment, result.urgency, result.core_issue, result.weight or 1)
         
-        return aggregated
+        return stats.summary()
     
-    def generate_summary_table(self) -> str:
-        """生成核心数据汇总表"""
-        stats = self.aggregate_statistics()
+    def iter_summary_lines(self, stats: Optional[Dict] = None) -> Iterator[str]:
+        """逐行生成核心数据汇总表（可传入流式统计的 summary() 结果）"""
+        if stats is None:
+            return self._summary_lines(self.aggregate_statistics(), self.dedupe_info)
+        return self._summary_lines(stats, None)
+    
+    def _summary_lines(self, stats: Dict, dedupe_info: Optional[Dict]) -> Iterator[str]:
+        yield "| 问题分类 | 出现次数 | 情感均分 | 最高紧迫度 | 典型槽点(3-5字) |"
+        yield "|---------|---------|---------|-----------|---------------|"
         
         if not stats:
-            return "| 问题分类 | 出现次数 | 情感均分 | 最高紧迫度 | 典型槽点(3-5字) |\n|---------|---------|---------|-----------|---------------|\n| 无数据 | 0 | 0.0 | - | - |"
-        
-        lines = ["| 问题分类 | 出现次数 | 情感均分 | 最高紧迫度 | 典型槽点(3-5字) |"]
-        lines.append("|---------|---------|---------|-----------|---------------|")
+            yield "| 无数据 | 0 | 0.0 | - | - |"
         
         # 按分类序号排序
-        sorted_categories = sorted(stats.items(), key=lambda x: int(x[0].split('-')[0]) if x[0].split('-')[0].isdigit() else 999)
+        sorted_categories = sorted(stats.items(), key=lambda x: self.rules.category_rank.get(x[0], 999))
         
         for category, data in sorted_categories:
-            lines.append(
-                f"| {category} | {data['count']} | {data['avg_sentiment']} | {data['highest_urgency']} | {data['typical_issue']} |"
+            yield (f"| {_markdown_cell(category)} | {data['count']} | {data['avg_sentiment']} | "
+                   f"{data['highest_urgency']} | {_markdown_cell(data['typical_issue'])} |")
+        
+        # 开启近重复折叠时，在汇总表下方注明去重比例
+        if dedupe_info:
+            yield ""
+            yield (
+                f"> 近重复折叠：共 {dedupe_info['total']} 条评论，"
+                f"实际分析 {dedupe_info['unique']} 条，去重比例 {dedupe_info['ratio']:.1%}"
             )
-        
-        return "\n".join(lines)
+    
+    def iter_detail_lines(self, results: Optional[Iterable[AnalysisResult]] = None) -> Iterator[str]:
+        """逐行生成全量评论分析明细表（可传入 analyze_stream 等结果迭代器）"""
+        if results is None:
+            results = self.analysis_results
+        
+        yield "| ID | 一级分类 | 情感分数 | 紧迫度 | 核心槽点 | 原文摘要（前10字） |"
+        yield "|----|---------|---------|-------|---------|-----------------|"
+        
+        empty = True
+        for result in results:
+            empty = False
+            category_label = result.category_label
+            core_issue = result.core_issue
+            summary = result.summary
+            line = (f"| {result.id} | {category_label} | {result.sentiment_label} | {result.urgency_label} | "
+                    f"{core_issue} | {summary} |")
+            # 绝大多数行不含竖线与换行，原样输出；否则逐个单元格转义后重新拼接
+            if "\n" in line or "\r" in line or "|" in summary or "|" in core_issue or "|" in category_label:
+                line = (f"| {result.id} | {_markdown_cell(category_label)} | {result.sentiment_label} | "
+                        f"{result.urgency_label} | {_markdown_cell(core_issue)} | {_markdown_cell(summary)} |")
+            yield line
+        
+        if empty:
+            yield "| - | - | - | - | - | - |"
+    
+    def generate_summary_table(self, stats: Optional[Dict] = None) -> str:
+        """生成核心数据汇总表（可传入流式统计的 summary() 结果）"""
+        return "\n".join(self.iter_summary_lines(stats))
     
     def generate_detail_table(self) -> str:
         """生成全量评论分析明细表"""
-        if not self.analysis_results:
-            return "| ID | 一级分类 | 情感分数 | 紧迫度 | 核心槽点 | 原文摘要（前10字） |\n|----|---------|---------|-------|---------|-----------------|\n| - | - | - | - | - | - |"
-        
-        lines = ["| ID | 一级分类 | 情感分数 | 紧迫度 | 核心槽点 | 原文摘要（前10字） |"]
-        lines.append("|----|---------|---------|-------|---------|-----------------|")
-        
-        for result in self.analysis_results:
-            lines.append(
-                f"| {result['id']} | {result['category']} | {result['sentiment']} | {result['urgency']} | {result['core_issue']} | {result['summary']} |"
-            )
+        return "\n".join(self.iter_detail_lines())
+    
+    def write_summary_table(self, sink: TextIO, stats: Optional[Dict] = None):
+        """将核心数据汇总表写入文件对象"""
+        _write_lines(sink, self.iter_summary_lines(stats))
+    
+    def write_detail_table(self, sink: TextIO, results: Optional[Iterable[AnalysisResult]] = None):
+        """将全量评论分析明细表逐行写入文件对象"""
+        _write_lines(sink, self.iter_detail_lines(results))
+    
+    def report_sections(self) -> Tuple[str, str]:
+        """分析所有评论，分别返回 (核心数据汇总表, 全量评论分析明细表)"""
+        self.analyze()
+        # 先聚合再渲染，aggregate 与 render_report 两个环节的耗时互不包含
+        stats = self.aggregate_statistics()
+        with self._timed("render_report"):
+            return "\n".join(self._summary_lines(stats, self.dedupe_info)), self.generate_detail_table()
+    
+    def write_report(self, sink: TextIO):
+        """分析所有评论，并将完整报告逐行写入文件对象"""
+        self.analyze()
+        stats = self.aggregate_statistics()
+        with self._timed("render_report"):
+            _write_lines(sink, self._summary_lines(stats, self.dedupe_info))
+            sink.write(REPORT_SEPARATOR)
+            self.write_detail_table(sink)
+    
+    def write_stream_report(self, comments: Iterable[str], sink: TextIO):
+        """流式分析评论并写出完整报告，内存占用与评论数量无关
         
-        return "\n".join(lines)
+        汇总表需要在全部评论分析完成后才能确定，明细行先写入临时文件，最后拼接到汇总表之后。
+        """
+        stats = StatsAggregator(self.rules.category_labels)
+        self.write_results_report(self.analyze_stream(comments, stats), stats, sink)
+    
+    def write_results_report(self, results: Iterable[AnalysisResult], stats: StatsAggregator, sink: TextIO):
+        """将结果迭代器写成完整报告，stats 须随迭代同步更新（如 analyze_stream 传入的统计）"""
+        import shutil
+        import tempfile
+        
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as detail:
+            self.write_detail_table(detail, results)
+            self.write_summary_table(sink, stats.summary())
+            sink.write(REPORT_SEPARATOR)
+            detail.seek(0)
+            shutil.copyfileobj(detail, sink)
     
     def generate_report(self) -> str:
         """生成完整报告"""
-        self.analyze()
-        
-        summary_table = self.generate_summary_table()
-        detail_table = self.generate_detail_table()
-        
-        report = f"{summary_table}\n\n---\n\n{detail_table}"
-        
-        return report
+        buffer = io.StringIO()
+        self.write_report(buffer)
+        return buffer.getvalue()
+
+
+def _write_lines(sink: TextIO, lines: Iterable[str]):
+    """按行写入文件对象，行与行之间以换行分隔（末尾不加换行）"""
+    for n, line in enumerate(lines):
+        if n:
+            sink.write("\n")
+        sink.write(line)
 
 
 def main():
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多维统计立方体
+按 时间桶 × 分类 × 紧迫度 × 版本 × 平台 增量维护评论数与情感总分，
+同时维护小时桶和日桶两级：任意时间范围的切片与上卷只读取预聚合的格子，无需重新分析
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from results import INVALID_CATEGORY, URGENCY_LABELS, Sentiment
+
+HOUR = 3600
+DAY = 86400
+
+GRANULARITIES = {"hour": HOUR, "day": DAY}
+
+# 可用于上卷分组的维度
+DIMENSIONS = ("time", "category", "urgency", "version", "platform")
+
+# 桶内格子的键：(分类, 紧迫度, 版本, 平台)
+CellKey = Tuple[int, int, str, str]
+
+_KEY_INDEX = {"category": 0, "urgency": 1, "version": 2, "platform": 3}
+
+
+class CubeCell:
+    """一个格子的统计量：评论数、有效评分数、情感总分与负面（1-2 分）评论数"""
+
+    __slots__ = ("count", "scored", "sentiment_sum", "negative")
+
+    def __init__(self):
+        self.count = 0
+        self.scored = 0
+        self.sentiment_sum = 0
+        self.negative = 0
+
+    def add(self, sentiment: int, weight: int = 1):
+        self.count += weight
+        if sentiment != Sentiment.NA:
+            self.scored += weight
+            self.sentiment_sum += sentiment * weight
+            if sentiment <= Sentiment.DISSATISFIED:
+                self.negative += weight
+
+    def merge(self, other: "CubeCell") -> "CubeCell":
+        self.count += other.count
+        self.scored += other.scored
+        self.sentiment_sum += other.sentiment_sum
+        self.negative += other.negative
+        return self
+
+    @property
+    def avg_sentiment(self) -> Optional[float]:
+        """平均情感分（无有效评分时为 None）"""
+        return round(self.sentiment_sum / self.scored, 2) if self.scored else None
+
+    @property
+    def negative_ratio(self) -> Optional[float]:
+        """负面评论占有效评分的比例"""
+        return round(self.negative / self.scored, 4) if self.scored else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "scored": self.scored,
+            "sentiment_sum": self.sentiment_sum,
+            "avg_sentiment": self.avg_sentiment,
+            "negative": self.negative,
+            "negative_ratio": self.negative_ratio,
+        }
+
+    def __repr__(self) -> str:
+        return f"CubeCell(count={self.count}, avg_sentiment={self.avg_sentiment}, negative={self.negative})"
+
+
+def _contains(allowed: Optional[frozenset], value) -> bool:
+    return allowed is None or value in allowed
+
+
+class StatsCube:
+    """时间分桶的多维统计
+
+    时间桶按 tz_offset（秒，如北京时间为 8 * 3600）对齐到本地整点与零点。
+    每条结果以 O(1) 同时更新小时桶与日桶；查询时整天用日桶，首尾不足一天的部分用小时桶。
+    """
+
+    def __init__(self, category_labels: Tuple[str, ...], tz_offset: int = 0):
+        self.category_labels = category_labels
+        self.tz_offset = tz_offset
+        self.hours: Dict[int, Dict[CellKey, CubeCell]] = {}
+        self.days: Dict[int, Dict[CellKey, CubeCell]] = {}
+        self.total = 0
+        self.first: Optional[int] = None
+        self.last: Optional[int] = None
+
+    def floor(self, timestamp: float, granularity: str = "hour") -> int:
+        """时间所在桶的起点"""
+        size = GRANULARITIES[granularity]
+        return int((timestamp + self.tz_offset) // size * size - self.tz_offset)
+
+    def add(self, timestamp: float, category: int, sentiment: int, urgency: int,
+            version: str = "", platform: str = "", weight: int = 1):
+        """加入一条编码后的结果"""
+        hour = self.floor(timestamp)
+        day = self.floor(timestamp, "day")
+        key = (category, urgency, version, platform)
+        for level, bucket in ((self.hours, hour), (self.days, day)):
+            cells = level.get(bucket)
+            if cells is None:
+                cells = level[bucket] = {}
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = CubeCell()
+            cell.add(sentiment, weight)
+        self.total += weight
+        if self.first is None or hour < self.first:
+            self.first = hour
+        if self.last is None or hour > self.last:
+            self.last = hour
+
+    def add_result(self, record, result):
+        """加入一条 CommentRecord 及其 AnalysisResult"""
+        self.add(record.timestamp, result.category, result.sentiment, result.urgency,
+                 record.version, record.platform, result.weight or 1)
+
+    def merge(self, other: "StatsCube") -> "StatsCube":
+        """合并另一个立方体（如并行分片各自维护的结果）"""
+        if other.category_labels != self.category_labels or other.tz_offset != self.tz_offset:
+            raise ValueError("只能合并使用相同规则集与时区的立方体")
+        for level, other_level in ((self.hours, other.hours), (self.days, other.days)):
+            for bucket, other_cells in other_level.items():
+                cells = level.setdefault(bucket, {})
+                for key, other_cell in other_cells.items():
+                    cell = cells.get(key)
+                    if cell is None:
+                        cell = cells[key] = CubeCell()
+                    cell.merge(other_cell)
+        self.total += other.total
+        if other.first is not None:
+            self.first = other.first if self.first is None else min(self.first, other.first)
+            self.last = other.last if self.last is None else max(self.last, other.last)
+        return self
+
+    def prune(self, before: float):
+        """丢弃 before 之前（按小时取整）的桶，长期运行时限制内存"""
+        hour = self.floor(before)
+        for bucket in [b for b in self.hours if b < hour]:
+            cells = self.hours.pop(bucket)
+            self.total -= sum(cell.count for cell in cells.values())
+        # 跨越 before 的那一天保留日桶；查询从剩余的第一个小时桶开始，这一天只会按小时桶读取
+        for bucket in [b for b in self.days if b + DAY <= hour]:
+            del self.days[bucket]
+        self.first = min(self.hours) if self.hours else None
+        if self.first is None:
+            self.last = None
+
+    def _iter_buckets(self, start: Optional[float], end: Optional[float],
+                      use_days: bool = True) -> Iterator[Tuple[int, Dict[CellKey, CubeCell]]]:
+        """覆盖 [start, end) 的桶（按小时取整），整天优先使用日桶"""
+        if self.first is None:
+            return
+        hour = self.floor(start) if start is not None else self.first
+        hour = max(hour, self.first)
+        stop = self.floor(end - 1) + HOUR if end is not None else self.last + HOUR
+        stop = min(stop, self.last + HOUR)
+        while hour < stop:
+            if use_days and self.floor(hour, "day") == hour and hour + DAY <= stop:
+                cells = self.days.get(hour)
+                step = DAY
+            else:
+                cells = self.hours.get(hour)
+                step = HOUR
+            if cells:
+                yield hour, cells
+            hour += step
+
+    def _iter_cells(self, start, end, categories, urgencies, versions, platforms,
+                    use_days: bool = True) -> Iterator[Tuple[int, CellKey, CubeCell]]:
+        categories = frozenset(categories) if categories is not None else None
+        urgencies = frozenset(urgencies) if urgencies is not None else None
+        versions = frozenset(versions) if versions is not None else None
+        platforms = frozenset(platforms) if platforms is not None else None
+        for bucket, cells in self._iter_buckets(start, end, use_days):
+            for key, cell in cells.items():
+                category, urgency, version, platform = key
+                if (_contains(categories, category) and _contains(urgencies, urgency)
+                        and _contains(versions, version) and _contains(platforms, platform)):
+                    yield bucket, key, cell
+
+    def slice(self, start: Optional[float] = None, end: Optional[float] = None,
+              categories: Optional[Iterable[int]] = None, urgencies: Optional[Iterable[int]] = None,
+              versions: Optional[Iterable[str]] = None, platforms: Optional[Iterable[str]] = None) -> CubeCell:
+        """时间范围 [start, end) 内满足筛选条件（None 表示不筛选）的合计"""
+        total = CubeCell()
+        for _, _, cell in self._iter_cells(start, end, categories, urgencies, versions, platforms):
+            total.merge(cell)
+        return total
+
+    def rollup(self, by: Sequence[str] = ("category",), granularity: str = "day",
+               start: Optional[float] = None, end: Optional[float] = None,
+               categories: Optional[Iterable[int]] = None, urgencies: Optional[Iterable[int]] = None,
+               versions: Optional[Iterable[str]] = None,
+               platforms: Optional[Iterable[str]] = None) -> Dict[Tuple, CubeCell]:
+        """按 by 中的维度分组上卷，"time" 按 granularity（hour/day）分桶；返回 {分组键元组: 合计}"""
+        unknown = [name for name in by if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"不支持的维度：{', '.join(unknown)}（可选 {', '.join(DIMENSIONS)}）")
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"不支持的时间粒度：{granularity}（可选 {', '.join(GRANULARITIES)}）")
+        # 按小时分组时不能使用日桶
+        use_days = granularity == "day" or "time" not in by
+        groups: Dict[Tuple, CubeCell] = {}
+        for bucket, key, cell in self._iter_cells(start, end, categories, urgencies, versions, platforms, use_days):
+            group = tuple(
+                self.floor(bucket, granularity) if name == "time" else key[_KEY_INDEX[name]] for name in by
+            )
+            total = groups.get(group)
+            if total is None:
+                total = groups[group] = CubeCell()
+            total.merge(cell)
+        return groups
+
+    def rollup_rows(self, by: Sequence[str] = ("category",), granularity: str = "day", **filters) -> List[Dict]:
+        """上卷结果的展示行（分类、紧迫度转换为标签，按分组键排序），可直接传给 DataFrame"""
+        rows = []
+        for group, cell in sorted(self.rollup(by, granularity, **filters).items()):
+            row = {}
+            for name, value in zip(by, group):
+                if name == "category":
+                    value = self.category_labels[value] if value else INVALID_CATEGORY
+                elif name == "urgency":
+                    value = URGENCY_LABELS[value]
+                row[name] = value
+            row.update(cell.to_dict())
+            rows.append(row)
+        return rows
+
+    def values(self, dimension: str) -> List:
+        """某个维度出现过的取值（如全部版本），用于筛选控件"""
+        if dimension not in _KEY_INDEX:
+            raise ValueError(f"不支持的维度：{dimension}")
+        index = _KEY_INDEX[dimension]
+        return sorted({key[index] for cells in self.days.values() for key in cells})
+
+    def cell_count(self) -> int:
+        """小时桶与日桶中的格子总数（内存占用与之成正比）"""
+        return sum(len(cells) for cells in self.hours.values()) + sum(len(cells) for cells in self.days.values())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近重复评论折叠
+使用 MinHash + LSH 将刷屏、复制粘贴产生的近似评论聚成簇，每簇只分析一条代表评论
+签名采用单次排列 MinHash（one permutation hashing）：每个分片只哈希一次，按哈希值分入 num_perm 个桶，
+每桶取最小值，空桶用旋转致密化填充。安装了 numpy 时整块评论一次向量化计算签名，结果与纯 Python 实现一致
+"""
+
+import math
+import operator
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# 去掉标点、空白、表情等，只保留文字和数字
+_STRIP_PATTERN = re.compile(r'[\W_]+')
+
+_MASK64 = (1 << 64) - 1
+# 空桶标记（哈希值恰好等于它的分片视为不存在，两种实现处理一致）
+_EMPTY = _MASK64
+# 分片编码的多项式底数与致密化的距离偏移系数
+_BASE = 0x100000001B3
+_MIX = 0x9E3779B97F4A7C15
+# MurmurHash3 fmix64 的乘数
+_FMIX1 = 0xFF51AFD7ED558CCD
+_FMIX2 = 0xC4CEB9FE1A85EC53
+
+# 向量化计算签名时每块的评论条数，限制中间数组的内存
+SIGNATURE_BLOCK = 8192
+
+# 每个 LSH 桶最多记录的簇数：高频短语（如"这个应用"）的分片占据的桶几乎人人命中，
+# 候选过多时逐一比较签名的开销远超折叠省下的分析时间，满了之后新簇不再加入该桶
+MAX_BUCKET_SIZE = 64
+
+
+def _fmix64(x: int) -> int:
+    x ^= x >> 33
+    x = x * _FMIX1 & _MASK64
+    x ^= x >> 33
+    x = x * _FMIX2 & _MASK64
+    return x ^ (x >> 33)
+
+
+@lru_cache(maxsize=1 << 18)
+def _shingle_hash(shingle: str) -> int:
+    """分片的 64 位哈希；常见分片（如双字组合）在评论间大量重复，缓存后只计算一次"""
+    x = 0
+    factor = 1
+    for char in shingle:
+        x = (x + (ord(char) + 1) * factor) & _MASK64
+        factor = factor * _BASE & _MASK64
+    return _fmix64(x)
+
+
+def _numpy():
+    """numpy 为可选依赖，未安装时返回 None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class NearDuplicateCollapser:
+    """基于 MinHash/LSH 的近重复评论聚类"""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 32, bands: int = 8,
+                 shingle_size: int = 2, use_numpy: bool = True):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        # 签名长度（桶数）
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.use_numpy = use_numpy
+
+    def normalize(self, comment: str) -> str:
+        """折叠用的规范化文本：去掉标点、空白和表情，统一小写"""
+        return _STRIP_PATTERN.sub('', comment).lower()
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """计算文本的 MinHash 签名"""
+        size = self.shingle_size
+        if len(text) <= size:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + size] for i in range(len(text) - size + 1)}
+        bins = self.num_perm
+        sig = [_EMPTY] * bins
+        for shingle in shingles:
+            h = _shingle_hash(shingle)
+            b = h % bins
+            if h < sig[b]:
+                sig[b] = h
+        if _EMPTY not in sig:
+            return tuple(sig)
+
+        # 短文本会留下空桶：按循环顺序取其后第一个非空桶的值，并按距离偏移（旋转致密化）
+        dense = list(sig)
+        following = distance = 0
+        for i in range(2 * bins - 1, -1, -1):
+            value = sig[i % bins]
+            if value != _EMPTY:
+                following, distance = value, 0
+                continue
+            distance += 1
+            if i < bins:
+                dense[i] = (following + distance * _MIX) & _MASK64
+        return tuple(dense)
+
+    def signatures(self, texts: Sequence[str]) -> List[Tuple[int, ...]]:
+        """批量计算签名；安装了 numpy 时向量化计算"""
+        return self._signatures_with_bands(texts)[0]
+
+    def _signatures_with_bands(self, texts: Sequence[str]) -> Tuple[List[Tuple[int, ...]], List[List]]:
+        """批量计算签名与各条带的 LSH 键
+
+        条带取间隔的桶（第 b 个条带为 b、b + bands、……）：致密化填充的空桶与其来源桶相邻，
+        分散到不同条带以减少误碰撞。numpy 实现把每个条带压成一个整数键；键碰撞只会多出候选，
+        候选都要再比较签名，聚类结果与纯 Python 实现相同
+        """
+        np = _numpy() if self.use_numpy else None
+        if np is None or not texts:
+            bands = self.bands
+            signatures = [self.signature(text) for text in texts]
+            return signatures, [[sig[band::bands] for band in range(bands)] for sig in signatures]
+        return self._numpy_signatures(np, texts)
+
+    def _numpy_signatures(self, np, texts: Sequence[str]) -> Tuple[List[Tuple[int, ...]], List[List]]:
+        size = self.shingle_size
+        bins = self.num_perm
+        n = len(texts)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64) + 1
+        # 末尾补零，取分片字符时不越界
+        codes = np.concatenate([codes, np.zeros(size, dtype=np.uint64)])
+        starts = np.cumsum(lengths) - lengths
+
+        # 每条评论的分片：长度不超过 size 的整条作为一个分片，否则为每个长度 size 的窗口
+        counts = np.maximum(lengths - size + 1, 1)
+        owner = np.repeat(np.arange(n), counts)
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = starts[owner] + offsets
+        shingle_lengths = np.minimum(lengths[owner], size)
+
+        x = np.zeros(len(positions), dtype=np.uint64)
+        factor = np.uint64(1)
+        for j in range(size):
+            x += np.where(j < shingle_lengths, codes[positions + j], 0).astype(np.uint64) * factor
+            factor = np.uint64(int(factor) * _BASE & _MASK64)
+        x ^= x >> np.uint64(33)
+        x *= np.uint64(_FMIX1)
+        x ^= x >> np.uint64(33)
+        x *= np.uint64(_FMIX2)
+        x ^= x >> np.uint64(33)
+
+        sig = np.full(n * bins, _EMPTY, dtype=np.uint64)
+        np.minimum.at(sig, owner * bins + (x % np.uint64(bins)).astype(np.int64), x)
+        sig = sig.reshape(n, bins)
+
+        empty = sig == np.uint64(_EMPTY)
+        if empty.any():
+            # 旋转致密化：在首尾相接的两倍长度上找每个桶之后第一个非空桶
+            doubled = np.concatenate([sig, sig], axis=1)
+            index = np.where(doubled != np.uint64(_EMPTY), np.arange(2 * bins), 2 * bins)
+            following = np.minimum.accumulate(index[:, ::-1], axis=1)[:, ::-1][:, :bins]
+            distance = (following - np.arange(bins)).astype(np.uint64)
+            values = np.take_along_axis(doubled, following, axis=1)
+            sig = np.where(empty, values + distance * np.uint64(_MIX), sig)
+
+        # 第 r 行第 b 个条带的桶号为 r * bands + b
+        rows = sig.reshape(n, self.rows, self.bands)
+        keys = rows[:, 0, :].copy()
+        for r in range(1, self.rows):
+            keys = keys * np.uint64(_BASE) ^ rows[:, r, :]
+        return list(map(tuple, sig.tolist())), keys.tolist()
+
+    def similarity(self, left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+        """由签名估计 Jaccard 相似度"""
+        return sum(map(operator.eq, left, right)) / self.num_perm
+
+    def _iter_signatures(self, texts: Sequence[str]) -> Iterator[Tuple[Tuple[int, ...], List]]:
+        block = iter(texts)
+        while True:
+            chunk = list(islice(block, SIGNATURE_BLOCK))
+            if not chunk:
+                return
+            yield from zip(*self._signatures_with_bands(chunk))
+
+    def collapse(self, comments: Sequence[str]) -> List[Tuple[int, int]]:
+        """聚类评论，返回 [(代表评论位置, 簇大小)]，按代表评论出现顺序排列"""
+        # 规范化后完全相同的评论只计算一次签名，归入第一次出现时所在的簇
+        text_index: Dict[str, int] = {}
+        first_positions: List[int] = []
+        text_of_position: List[int] = []
+        for position, comment in enumerate(comments):
+            text = self.normalize(comment)
+            index = text_index.get(text)
+            if index is None:
+                index = text_index[text] = len(first_positions)
+                first_positions.append(position)
+            text_of_position.append(index)
+
+        representatives: List[int] = []        # 簇编号 -> 代表评论位置
+        cluster_of_text: List[int] = []        # 去重后的文本编号 -> 簇编号
+        signatures: List[Tuple[int, ...]] = []
+        bands = self.bands
+        buckets: List[Dict] = [{} for _ in range(bands)]
+        # 相似度达标时最多有 mismatches 个位置不同，每个不同位置至多破坏一个条带，
+        # 因此候选至少要命中 min_bands 个条带才可能达标，其余候选不必逐一比较签名
+        mismatches = self.num_perm - math.ceil(self.threshold * self.num_perm - 1e-9)
+        min_bands = max(1, bands - mismatches)
+
+        for position, (sig, band_keys) in zip(first_positions, self._iter_signatures(list(text_index))):
+            # 在 LSH 桶中查找候选簇，取相似度达标的最早一簇
+            found: List[int] = []
+            for bucket, key in zip(buckets, band_keys):
+                members = bucket.get(key)
+                if members:
+                    found += members
+            cluster = None
+            if len(found) >= min_bands:
+                for candidate, hits in sorted(Counter(found).items()):
+                    if hits >= min_bands and self.similarity(sig, signatures[candidate]) >= self.threshold:
+                        cluster = candidate
+                        break
+
+            if cluster is None:
+                cluster = len(representatives)
+                representatives.append(position)
+                signatures.append(sig)
+                for bucket, key in zip(buckets, band_keys):
+                    members = bucket.get(key)
+                    if members is None:
+                        bucket[key] = [cluster]
+                    elif len(members) < MAX_BUCKET_SIZE:
+                        members.append(cluster)
+            cluster_of_text.append(cluster)
+
+        sizes = [0] * len(representatives)
+        for index in text_of_position:
+            sizes[cluster_of_text[index]] += 1
+        return list(zip(representatives, sizes))
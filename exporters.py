@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果批量导出
+将分析结果流式写出为 CSV、JSONL，安装 pyarrow 时还支持 Arrow IPC 与 Parquet，供下游数仓直接加载
+"""
+
+import csv
+import json
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, TextIO, Union
+
+from results import AnalysisResult
+
+EXPORT_COLUMNS = (
+    "id", "category", "category_code", "sentiment", "sentiment_label",
+    "urgency", "urgency_label", "core_issue", "summary", "original", "weight",
+)
+
+# 列式格式写入二进制流或路径，其余格式写入文本流
+BINARY_FORMATS = ("arrow", "parquet")
+
+
+def result_row(result: AnalysisResult) -> Dict:
+    """单条结果的导出行：同时保留编码与展示标签"""
+    return {
+        "id": result.id,
+        "category": result.category_label,
+        "category_code": int(result.category),
+        "sentiment": int(result.sentiment),
+        "sentiment_label": result.sentiment_label,
+        "urgency": int(result.urgency),
+        "urgency_label": result.urgency_label,
+        "core_issue": result.core_issue,
+        "summary": result.summary,
+        "original": result.original,
+        "weight": result.weight or 1,
+    }
+
+
+def iter_rows(results: Iterable[AnalysisResult]) -> Iterator[Dict]:
+    """逐条生成导出行"""
+    for result in results:
+        yield result_row(result)
+
+
+def write_csv(results: Iterable[AnalysisResult], sink: TextIO, header: bool = True) -> int:
+    """写出 CSV（sink 需以 newline='' 打开），返回写出行数"""
+    writer = csv.writer(sink)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in iter_rows(results):
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        count += 1
+    return count
+
+
+def write_jsonl(results: Iterable[AnalysisResult], sink: TextIO) -> int:
+    """写出 JSON Lines，返回写出行数"""
+    count = 0
+    for row in iter_rows(results):
+        sink.write(json.dumps(row, ensure_ascii=False))
+        sink.write("\n")
+        count += 1
+    return count
+
+
+def _require_pyarrow():
+    """按需导入 pyarrow（可选依赖）"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow/Parquet 导出需要安装 pyarrow：pip install pyarrow") from None
+    return pyarrow
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("category", pa.dictionary(pa.int8(), pa.string())),
+        ("category_code", pa.int8()),
+        ("sentiment", pa.int8()),
+        ("sentiment_label", pa.dictionary(pa.int8(), pa.string())),
+        ("urgency", pa.int8()),
+        ("urgency_label", pa.dictionary(pa.int8(), pa.string())),
+        ("core_issue", pa.string()),
+        ("summary", pa.string()),
+        ("original", pa.string()),
+        ("weight", pa.int64()),
+    ])
+
+
+def _iter_record_batches(pa, schema, results: Iterable[AnalysisResult], batch_size: int):
+    """将结果按批转换为 Arrow RecordBatch"""
+    rows = iter_rows(results)
+    while True:
+        chunk: List[Dict] = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        yield pa.RecordBatch.from_pylist(chunk, schema=schema)
+
+
+def write_arrow(results: Iterable[AnalysisResult], sink: Union[str, BinaryIO], batch_size: int = 65536) -> int:
+    """写出 Arrow IPC 文件（需要 pyarrow），返回写出行数"""
+    pa = _require_pyarrow()
+    schema = _arrow_schema(pa)
+    count = 0
+    with pa.ipc.new_file(sink, schema) as writer:
+        for batch in _iter_record_batches(pa, schema, results, batch_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+def write_parquet(results: Iterable[AnalysisResult], sink: Union[str, BinaryIO], batch_size: int = 65536) -> int:
+    """写出 Parquet 文件（需要 pyarrow），每批写为一个 row group，返回写出行数"""
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    count = 0
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in _iter_record_batches(pa, schema, results, batch_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "arrow": write_arrow,
+    "parquet": write_parquet,
+}
+
+
+def export_results(results: Iterable[AnalysisResult], path: str, fmt: str = "") -> int:
+    """按格式（默认取文件扩展名）将结果导出到文件，返回写出行数"""
+    fmt = (fmt or path.rsplit(".", 1)[-1]).lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"不支持的导出格式：{fmt}（可选 {', '.join(WRITERS)}）")
+    if fmt in BINARY_FORMATS:
+        return WRITERS[fmt](results, path)
+    with open(path, "w", encoding="utf-8", newline="") as sink:
+        return WRITERS[fmt](results, sink)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传文件读取
+按块流式解析 CSV（支持引号内换行）、XLSX 和纯文本中的评论，内存占用只与块大小有关
+"""
+
+import codecs
+import csv
+import io
+from itertools import islice
+from typing import BinaryIO, Iterator, List, Optional
+
+SUPPORTED_FORMATS = ("csv", "xlsx", "txt")
+
+# 评论列的常见列名，用于预选评论列
+COMMENT_COLUMN_HINTS = ("评论", "评价", "内容", "comment", "review", "content", "text")
+
+# 识别编码时读取的字节数
+_SNIFF_SIZE = 65536
+
+
+def _require_openpyxl():
+    """按需导入 openpyxl（可选依赖）"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("读取 XLSX 需要安装 openpyxl：pip install openpyxl") from None
+    return openpyxl
+
+
+def guess_comment_column(columns: List[str]) -> int:
+    """按常见列名猜测评论所在列，猜不到时取第一列"""
+    for i, name in enumerate(columns):
+        if any(hint in name.lower() for hint in COMMENT_COLUMN_HINTS):
+            return i
+    return 0
+
+
+def detect_encoding(fileobj: BinaryIO) -> str:
+    """根据文件开头判断编码：能按 UTF-8 解码则为 utf-8-sig，否则按 gb18030（Excel 导出的中文 CSV）"""
+    position = fileobj.tell()
+    sample = fileobj.read(_SNIFF_SIZE)
+    fileobj.seek(position)
+    try:
+        # 采样末尾可能截断多字节字符，使用增量解码器避免误判
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return "gb18030"
+    return "utf-8-sig"
+
+
+class CommentSource:
+    """上传文件中的评论来源：读取表头供选择评论列，按块产出评论并报告读取进度"""
+
+    def __init__(self, fileobj: BinaryIO, name: str = "", fmt: str = "", encoding: Optional[str] = None):
+        self.fileobj = fileobj
+        self.fmt = (fmt or name.rsplit(".", 1)[-1]).lower()
+        if self.fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的文件格式：{self.fmt}（可选 {', '.join(SUPPORTED_FORMATS)}）")
+
+        fileobj.seek(0, io.SEEK_END)
+        self.size = fileobj.tell()
+        fileobj.seek(0)
+        self.encoding = encoding or (detect_encoding(fileobj) if self.fmt != "xlsx" else None)
+        self.progress = 0.0
+
+    def columns(self) -> List[str]:
+        """表头（第一行）各列名称，纯文本返回空列表"""
+        if self.fmt == "txt":
+            return []
+        header = next(self._iter_rows(), [])
+        return [str(value).strip() if value is not None else f"列{i + 1}" for i, value in enumerate(header)]
+
+    def iter_comments(self, column: int = 0) -> Iterator[str]:
+        """逐条产出评论（去掉首尾空白，跳过空值）；CSV/XLSX 跳过表头，只取第 column 列"""
+        if self.fmt == "txt":
+            values = self._iter_lines()
+        else:
+            rows = self._iter_rows()
+            next(rows, None)
+            values = (row[column] if column < len(row) else None for row in rows)
+
+        for value in values:
+            if value is None:
+                continue
+            comment = str(value).strip()
+            if comment:
+                yield comment
+        self.progress = 1.0
+
+    def iter_chunks(self, column: int = 0, chunk_size: int = 5000) -> Iterator[List[str]]:
+        """按块产出评论列表，每块最多 chunk_size 条"""
+        comments = self.iter_comments(column)
+        while True:
+            chunk = list(islice(comments, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _open_text(self) -> io.TextIOWrapper:
+        self.fileobj.seek(0)
+        return io.TextIOWrapper(self.fileobj, encoding=self.encoding, errors="replace", newline="")
+
+    def _update_progress(self):
+        if self.size:
+            self.progress = min(self.fileobj.tell() / self.size, 1.0)
+
+    def _iter_lines(self) -> Iterator[str]:
+        text = self._open_text()
+        try:
+            for line in text:
+                self._update_progress()
+                yield line
+        finally:
+            # 解除包装，避免关闭上传的文件对象
+            text.detach()
+
+    def _iter_rows(self) -> Iterator[list]:
+        if self.fmt == "xlsx":
+            yield from self._iter_xlsx_rows()
+            return
+        text = self._open_text()
+        try:
+            for row in csv.reader(text):
+                self._update_progress()
+                yield row
+        finally:
+            text.detach()
+
+    def _iter_xlsx_rows(self) -> Iterator[tuple]:
+        openpyxl = _require_openpyxl()
+        self.fileobj.seek(0)
+        # 只读模式按行流式解析工作表，不载入整个文件的单元格对象
+        workbook = openpyxl.load_workbook(self.fileobj, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            total = sheet.max_row or 0
+            for count, row in enumerate(sheet.iter_rows(values_only=True), 1):
+                if total:
+                    self.progress = min(count / total, 1.0)
+                yield row
+        finally:
+            workbook.close()
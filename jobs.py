@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台分析任务
+所有会话共享一个有界线程池，每个会话有并发上限；任务可查询进度、可取消
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, Dict, Optional, Set
+
+# 默认工作线程数
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class JobStatus(Enum):
+    """任务状态"""
+    PENDING = "排队中"
+    RUNNING = "分析中"
+    DONE = "已完成"
+    FAILED = "失败"
+    CANCELLED = "已取消"
+
+
+class JobCancelled(Exception):
+    """任务被取消（由任务函数在检查点抛出）"""
+
+
+class JobLimitError(RuntimeError):
+    """会话的并发任务数已达上限"""
+
+
+class Job:
+    """后台任务句柄：任务函数通过 update/check_cancelled 汇报进度、响应取消"""
+
+    def __init__(self, session_id: str):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.status = JobStatus.PENDING
+        self.result = None
+        # 任务运行中发布的中间结果（如部分统计），供页面渐进展示
+        self.partial = None
+        self.error: Optional[BaseException] = None
+        self.processed = 0
+        self.progress = 0.0
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """请求取消：排队中的任务不再执行，运行中的任务在下一个检查点停止"""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """检查点：已请求取消时抛出 JobCancelled"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def update(self, processed: int, progress: float):
+        """汇报已处理条数和完成比例（0-1）"""
+        self.processed = processed
+        self.progress = min(max(progress, 0.0), 1.0)
+
+    def publish(self, partial):
+        """发布中间结果（整体替换，读取方总能拿到一致的快照）"""
+        self.partial = partial
+
+    def throughput(self) -> float:
+        """每秒处理条数"""
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        """按当前进度估算的剩余秒数，尚无进度时为 None"""
+        if self.done:
+            return 0.0
+        if self.progress <= 0:
+            return None
+        return self.elapsed() * (1 - self.progress) / self.progress
+
+    def elapsed(self) -> float:
+        """已运行秒数（未开始时为 0）"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class JobManager:
+    """有界线程池上的任务调度，限制每个会话同时运行的任务数"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, per_session_limit: int = 1):
+        self.max_workers = max_workers
+        self.per_session_limit = per_session_limit
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="voc-job")
+        self._lock = threading.Lock()
+        self._active: Dict[str, Set[Job]] = {}
+
+    def submit(self, session_id: str, fn: Callable, *args, **kwargs) -> Job:
+        """提交任务 fn(job, *args, **kwargs)，返回任务句柄；超出会话并发上限时抛出 JobLimitError"""
+        job = Job(session_id)
+        with self._lock:
+            active = self._active.setdefault(session_id, set())
+            if len(active) >= self.per_session_limit:
+                raise JobLimitError(f"每个会话最多同时运行 {self.per_session_limit} 个分析任务")
+            active.add(job)
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except RuntimeError:
+            self._release(job)
+            raise
+        return job
+
+    def active_count(self, session_id: str) -> int:
+        """会话中尚未结束的任务数"""
+        with self._lock:
+            return len(self._active.get(session_id, ()))
+
+    def stats(self) -> Dict:
+        """全部会话的排队与运行任务数"""
+        with self._lock:
+            jobs = [job for active in self._active.values() for job in active]
+        return {
+            "workers": self.max_workers,
+            "pending": sum(1 for job in jobs if job.status is JobStatus.PENDING),
+            "running": sum(1 for job in jobs if job.status is JobStatus.RUNNING),
+            "sessions": len({job.session_id for job in jobs}),
+        }
+
+    def shutdown(self, cancel: bool = True):
+        """关闭线程池（默认取消全部未结束的任务）"""
+        if cancel:
+            with self._lock:
+                for active in self._active.values():
+                    for job in active:
+                        job.cancel()
+        self._executor.shutdown(wait=True)
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict):
+        try:
+            job.started_at = time.monotonic()
+            job.check_cancelled()
+            job.status = JobStatus.RUNNING
+            job.result = fn(job, *args, **kwargs)
+            job.status = JobStatus.DONE
+        except JobCancelled:
+            job.status = JobStatus.CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = time.monotonic()
+            self._release(job)
+
+    def _release(self, job: Job):
+        with self._lock:
+            active = self._active.get(job.session_id)
+            if active is not None:
+                active.discard(job)
+                if not active:
+                    del self._active[job.session_id]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多模式关键词匹配器
+基于 Aho-Corasick 自动机，一次扫描即可找出文本中所有关键词的命中位置
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """Aho-Corasick 关键词自动机"""
+
+    def __init__(self, keywords: Iterable[str], state: Optional[Dict] = None):
+        # 去重并保持首次出现的顺序
+        self.keywords: List[str] = list(dict.fromkeys(k for k in keywords if k))
+
+        # 状态转移表、失败指针、每个状态上输出的关键词编号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        if state is not None:
+            self._load_state(state)
+            return
+        for keyword_id, keyword in enumerate(self.keywords):
+            self._insert(keyword, keyword_id)
+        self._build_failure_links()
+
+    def to_state(self) -> Dict:
+        """导出自动机的纯数据形式（可写入 JSON），用于磁盘缓存"""
+        return {"goto": self._goto, "fail": self._fail, "output": [list(ids) for ids in self._output]}
+
+    def _load_state(self, state: Dict):
+        """从 to_state 导出的数据恢复自动机；结构不合法时抛出 ValueError"""
+        goto, fail, output = state["goto"], state["fail"], state["output"]
+        size = len(goto)
+        if not size or len(fail) != size or len(output) != size:
+            raise ValueError("自动机数据不完整")
+        keyword_count = len(self.keywords)
+        for transitions, fallback, ids in zip(goto, fail, output):
+            if not isinstance(transitions, dict) or not isinstance(fallback, int) or not 0 <= fallback < size:
+                raise ValueError("自动机数据不合法")
+            for char, next_state in transitions.items():
+                if not isinstance(char, str) or len(char) != 1 or not isinstance(next_state, int) \
+                        or not 0 < next_state < size:
+                    raise ValueError("自动机数据不合法")
+            if not all(isinstance(i, int) and 0 <= i < keyword_count for i in ids):
+                raise ValueError("自动机数据不合法")
+
+        # 转移必须构成以 0 为根的树，失败指针必须指向更浅的状态，否则扫描可能陷入死循环
+        depth = [-1] * size
+        depth[0] = 0
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            for next_state in goto[state].values():
+                if depth[next_state] != -1:
+                    raise ValueError("自动机数据不合法")
+                depth[next_state] = depth[state] + 1
+                queue.append(next_state)
+        if fail[0] != 0 or any(d == -1 or depth[f] >= d for d, f in zip(depth[1:], fail[1:])):
+            raise ValueError("自动机数据不合法")
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(ids) for ids in output]
+
+    def _insert(self, keyword: str, keyword_id: int):
+        """将关键词插入字典树"""
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = self._output[state] + (keyword_id,)
+
+    def _build_failure_links(self):
+        """按层次遍历构建失败指针，并合并后缀状态的输出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """扫描文本，返回所有命中 (起始位置, 关键词)，按结束位置排序"""
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        hits = []
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for keyword_id in output[state]:
+                    keyword = keywords[keyword_id]
+                    hits.append((pos - len(keyword) + 1, keyword))
+        return hits
+
+    def first_offsets(self, text: str) -> Dict[str, int]:
+        """扫描文本，返回每个命中关键词首次出现的起始位置"""
+        offsets: Dict[str, int] = {}
+        for start, keyword in self.find_all(text):
+            offsets.setdefault(keyword, start)
+        return offsets
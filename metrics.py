@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析流水线指标
+各环节耗时、单条评论延迟直方图、关键词命中计数、慢评论采样与 tracemalloc 内存快照，
+可导出为字典或 Prometheus 文本格式。通过 CommentAnalyzer.enable_metrics() 按需开启，未开启时不产生开销
+"""
+
+import heapq
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 单条评论依次经过的环节
+COMMENT_STAGES = ("normalize", "scan", "classify", "sentiment", "urgency", "core_issue")
+
+# 单条评论延迟直方图的桶上界（秒）
+DEFAULT_LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+# 慢评论采样中保留的原文长度
+_SAMPLE_TEXT_LENGTH = 100
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Prometheus 格式的累计桶：[(上界, 不超过该上界的次数)]"""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶上界估计分位数，无数据时为 None"""
+        if not self.count:
+            return None
+        target = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return float("inf")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class PipelineMetrics:
+    """分析流水线的指标收集（非线程安全，与分析器在同一线程中使用）"""
+
+    def __init__(self, slow_threshold: float = 0.005, slow_samples: int = 20,
+                 latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, track_memory: bool = False):
+        self.slow_threshold = slow_threshold
+        self.slow_samples = slow_samples
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.latency = Histogram(latency_buckets)
+        self.keyword_hits: Counter = Counter()
+        self.comments = 0
+        self.cache_hits = 0
+        # 最慢的若干条评论（小顶堆）：(耗时, 序号, 原文前缀)
+        self._slow: List[Tuple[float, int, str]] = []
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record_stage(self, name: str, seconds: float, calls: int = 1):
+        """累计一个环节的耗时"""
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        self.stage_calls[name] = self.stage_calls.get(name, 0) + calls
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """计时 with 语句块，计入环节 name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_comment(self, comment: str, seconds: float, stage_seconds: Sequence[float] = (),
+                       hits: Optional[Dict[str, int]] = None):
+        """记录一条评论：总耗时、各环节耗时（顺序同 COMMENT_STAGES）、命中的关键词"""
+        self.comments += 1
+        self.latency.observe(seconds)
+        for name, elapsed in zip(COMMENT_STAGES, stage_seconds):
+            self.record_stage(name, elapsed)
+        if hits:
+            self.keyword_hits.update(hits.keys())
+        if seconds >= self.slow_threshold:
+            sample = (seconds, self.comments, comment[:_SAMPLE_TEXT_LENGTH])
+            if len(self._slow) < self.slow_samples:
+                heapq.heappush(self._slow, sample)
+            elif sample > self._slow[0]:
+                heapq.heapreplace(self._slow, sample)
+
+    def record_cache_hit(self, comment: str, seconds: float, hits: Optional[Dict[str, int]] = None):
+        """记录一条命中结果缓存的评论及其命中的关键词"""
+        self.cache_hits += 1
+        self.record_comment(comment, seconds, hits=hits)
+
+    def slow_comments(self) -> List[Dict]:
+        """最慢的评论样本，按耗时从高到低"""
+        return [
+            {"seconds": round(seconds, 6), "index": index, "comment": text}
+            for seconds, index, text in sorted(self._slow, reverse=True)
+        ]
+
+    def memory_snapshot(self, limit: int = 10) -> Dict:
+        """tracemalloc 当前/峰值内存与分配最多的代码位置（需以 track_memory=True 创建）"""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+        return {
+            "tracing": True,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+                for stat in stats
+            ],
+        }
+
+    def stop_memory_tracking(self):
+        """停止 tracemalloc"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory = False
+
+    def reset(self):
+        """清空已收集的指标"""
+        self.__init__(self.slow_threshold, self.slow_samples, self.latency.buckets, self.track_memory)
+
+    def to_dict(self) -> Dict:
+        """全部指标的字典视图"""
+        result = {
+            "comments": self.comments,
+            "cache_hits": self.cache_hits,
+            "stages": {
+                name: {
+                    "seconds": round(seconds, 6),
+                    "calls": self.stage_calls[name],
+                    "avg_us": round(seconds / self.stage_calls[name] * 1e6, 3),
+                }
+                for name, seconds in self.stage_seconds.items()
+            },
+            "latency": {
+                "count": self.latency.count,
+                "sum_seconds": round(self.latency.sum, 6),
+                "p50_le": self.latency.quantile(0.5),
+                "p99_le": self.latency.quantile(0.99),
+                "buckets": dict(self.latency.cumulative()),
+            },
+            "keyword_hits": dict(self.keyword_hits.most_common()),
+            "slow_comments": self.slow_comments(),
+        }
+        if self.track_memory:
+            result["memory"] = self.memory_snapshot()
+        return result
+
+    def to_prometheus(self, prefix: str = "voc") -> str:
+        """Prometheus 文本格式"""
+        lines = [
+            f"# HELP {prefix}_comments_total 已分析的评论数",
+            f"# TYPE {prefix}_comments_total counter",
+            f"{prefix}_comments_total {self.comments}",
+            f"# HELP {prefix}_cache_hits_total 命中结果缓存的评论数",
+            f"# TYPE {prefix}_cache_hits_total counter",
+            f"{prefix}_cache_hits_total {self.cache_hits}",
+            f"# HELP {prefix}_stage_seconds_total 各环节累计耗时",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, seconds in self.stage_seconds.items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{_escape_label(name)}"}} {seconds!r}')
+        lines += [
+            f"# HELP {prefix}_stage_calls_total 各环节调用次数",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for name, calls in self.stage_calls.items():
+            lines.append(f'{prefix}_stage_calls_total{{stage="{_escape_label(name)}"}} {calls}')
+
+        name = f"{prefix}_comment_latency_seconds"
+        lines += [f"# HELP {name} 单条评论分析耗时", f"# TYPE {name} histogram"]
+        for bound, count in self.latency.cumulative():
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines += [f"{name}_sum {self.latency.sum!r}", f"{name}_count {self.latency.count}"]
+
+        lines += [
+            f"# HELP {prefix}_keyword_hits_total 各关键词命中的评论数",
+            f"# TYPE {prefix}_keyword_hits_total counter",
+        ]
+        for keyword, count in self.keyword_hits.most_common():
+            lines.append(f'{prefix}_keyword_hits_total{{keyword="{_escape_label(keyword)}"}} {count}')
+
+        if self.track_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines += [
+                f"# HELP {prefix}_traced_memory_bytes tracemalloc 跟踪的内存",
+                f"# TYPE {prefix}_traced_memory_bytes gauge",
+                f'{prefix}_traced_memory_bytes{{kind="current"}} {current}',
+                f'{prefix}_traced_memory_bytes{{kind="peak"}} {peak}',
+            ]
+        return "\n".join(lines) + "\n"
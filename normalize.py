@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评论规范化
+每条评论只规范化一次：小写与全角转半角、汉字计数、有效性判断，供各分析环节共享
+"""
+
+import re
+from typing import Union
+
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+
+# 纯数字或符号
+_SYMBOLS_PATTERN = re.compile(r'[\d\s\W]+')
+
+# 全角 ASCII（！到～）转半角，全角空格转普通空格
+_HALFWIDTH_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_HALFWIDTH_TABLE[0x3000] = 0x20
+
+
+class NormalizedComment:
+    """规范化后的评论"""
+
+    __slots__ = ("original", "lowered", "stripped_length", "cjk_count", "invalid")
+
+    def __init__(self, comment: str):
+        self.original = comment
+        # 用于关键词匹配的文本：全角转半角后小写，与原文逐字符对齐
+        self.lowered = comment.translate(_HALFWIDTH_TABLE).lower()
+
+        stripped = comment.strip()
+        self.stripped_length = len(stripped)
+        self.cjk_count = len(CJK_PATTERN.findall(stripped))
+        self.invalid = self._check_invalid(stripped)
+
+    @property
+    def non_cjk_count(self) -> int:
+        return self.stripped_length - self.cjk_count
+
+    def _check_invalid(self, stripped: str) -> bool:
+        """判断是否为无效数据（无意义、广告、纯社交请求）"""
+        length = self.stripped_length
+
+        # 空评论或过短
+        if length < 2:
+            return True
+
+        # 纯乱码（大部分非中文字符）
+        if self.non_cjk_count / length > 0.7 and length > 10:
+            return True
+
+        # 纯数字或符号
+        if _SYMBOLS_PATTERN.fullmatch(stripped):
+            return True
+
+        return False
+
+
+def normalize(comment: Union[str, NormalizedComment]) -> NormalizedComment:
+    """规范化评论，已规范化的直接返回"""
+    if isinstance(comment, NormalizedComment):
+        return comment
+    return NormalizedComment(comment)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程并行分析
+输入按块分发到进程池，子进程把编码结果直接写入共享内存，只回传各块的槽点字符串表
+"""
+
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from results import BatchResult
+
+# 共享内存布局：[槽点编码 int32 × n][分类 × n][情感 × n][紧迫度 × n]
+_ISSUE_CODE_SIZE = array('i').itemsize
+_ROW_SIZE = _ISSUE_CODE_SIZE + 3
+
+# 子进程中的分析器实例，由进程池初始化时创建
+_worker_analyzer = None
+
+
+def _init_worker(analyzer_cls, rules):
+    """进程池初始化：每个子进程只构建一次分析器"""
+    global _worker_analyzer
+    _worker_analyzer = analyzer_cls(rules)
+
+
+def _attach(name: str) -> SharedMemory:
+    """子进程连接到已有的共享内存，由父进程负责释放"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13，子进程与父进程共用同一个 resource_tracker
+        return SharedMemory(name=name)
+
+
+def _column_views(buf, total: int):
+    """按布局切分共享内存，返回各列的字节视图（分类、情感、紧迫度、槽点编码）"""
+    issue_end = total * _ISSUE_CODE_SIZE
+    return (
+        buf[issue_end:issue_end + total],
+        buf[issue_end + total:issue_end + 2 * total],
+        buf[issue_end + 2 * total:issue_end + 3 * total],
+        buf[0:issue_end],
+    )
+
+
+def _analyze_chunk(shm_name: str, total: int, start: int, chunk: List[str]) -> Tuple[int, List[str]]:
+    """子进程：分析一块评论，结果写入共享内存，返回 (起始位置, 本块槽点表)"""
+    shm = _attach(shm_name)
+    views = _column_views(shm.buf, total)
+    categories, sentiments, urgencies, issue_bytes = views
+    issue_codes = issue_bytes.cast('i')
+    issues: List[str] = []
+    issue_lookup = {}
+    try:
+        for position, comment in enumerate(chunk, start):
+            category, sentiment, urgency, core_issue = _worker_analyzer.analyze_codes(comment)
+            issue_code = issue_lookup.get(core_issue)
+            if issue_code is None:
+                issue_code = issue_lookup[core_issue] = len(issues)
+                issues.append(core_issue)
+            categories[position] = category
+            sentiments[position] = sentiment
+            urgencies[position] = urgency
+            issue_codes[position] = issue_code
+    finally:
+        issue_codes.release()
+        for view in views:
+            view.release()
+        shm.close()
+    return start, issues
+
+
+def analyze_parallel(analyzer, comments: Sequence[str], workers: Optional[int] = None,
+                     chunk_size: int = 5000) -> BatchResult:
+    """使用进程池并行分析，返回与 analyze_batch 相同的列式结果（ID 与顺序分析一致）"""
+    total = len(comments)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or total <= chunk_size:
+        return analyzer.analyze_batch(comments)
+
+    batch = BatchResult(comments, analyzer.rules.category_labels)
+    shm = SharedMemory(create=True, size=total * _ROW_SIZE)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(type(analyzer), analyzer.rules)) as pool:
+            futures = [
+                pool.submit(_analyze_chunk, shm.name, total, start, list(comments[start:start + chunk_size]))
+                for start in range(0, total, chunk_size)
+            ]
+            chunk_issues = [future.result() for future in futures]
+
+        views = _column_views(shm.buf, total)
+        categories, sentiments, urgencies, issue_codes = views
+        try:
+            batch.index = array('q', range(total))
+            batch.categories.frombytes(categories)
+            batch.sentiments.frombytes(sentiments)
+            batch.urgencies.frombytes(urgencies)
+            batch.issue_codes.frombytes(issue_codes)
+        finally:
+            for view in views:
+                view.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # 各块的局部槽点编码映射为全局编码
+    codes = batch.issue_codes
+    for start, issues in chunk_issues:
+        remap = [batch.intern_issue(issue) for issue in issues]
+        for position in range(start, min(start + chunk_size, total)):
+            codes[position] = remap[codes[position]]
+    return batch
+
+
+def _analyze_codes_chunk(chunk: List[str]) -> List[Tuple[int, int, int, str]]:
+    """子进程：分析一块评论，返回各条的编码结果（流式并行使用）"""
+    return [_worker_analyzer.analyze_codes(comment) for comment in chunk]
+
+
+def iter_parallel(analyzer, chunks: Iterable[List[str]], workers: Optional[int] = None,
+                  max_in_flight: Optional[int] = None) -> Iterator[Tuple[List[str], List[Tuple[int, int, int, str]]]]:
+    """流式并行分析：逐块读取输入分发到进程池，按输入顺序产出 (块, 各条编码结果)
+
+    在途块数不超过 max_in_flight（默认为进程数的 2 倍），输入无需一次性载入内存。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(type(analyzer), analyzer.rules)) as pool:
+        try:
+            for chunk in chunks:
+                pending.append((chunk, pool.submit(_analyze_codes_chunk, chunk)))
+                if len(pending) >= max_in_flight:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
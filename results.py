@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果的编码与列式存储
+分类、情感、紧迫度均以整数编码保存，展示标签只在需要时生成
+"""
+
+import sys
+from array import array
+from enum import IntEnum
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+INVALID_CATEGORY = "无效数据"
+INVALID_CATEGORY_CODE = 0
+# 分类编码以有符号字节存储（列式结果、并行分析的共享内存、Arrow 导出均为 int8）
+MAX_CATEGORY_CODE = 127
+
+SENTIMENT_LABELS = ("N/A", "1分（愤怒）", "2分（不满）", "3分（中立）", "4分（满意）", "5分（惊喜）")
+URGENCY_LABELS = ("P0（高危）", "P1（重要）", "P2（一般）", "N/A")
+
+
+class Sentiment(IntEnum):
+    """情感编码：0 表示无效数据，1-5 对应分值"""
+    NA = 0
+    ANGRY = 1
+    DISSATISFIED = 2
+    NEUTRAL = 3
+    SATISFIED = 4
+    DELIGHTED = 5
+
+    @property
+    def label(self) -> str:
+        return SENTIMENT_LABELS[self]
+
+
+class Urgency(IntEnum):
+    """紧迫度编码：数值越小越紧急"""
+    P0 = 0
+    P1 = 1
+    P2 = 2
+    NA = 3
+
+    @property
+    def label(self) -> str:
+        return URGENCY_LABELS[self]
+
+
+# 按编码索引的枚举成员，避免逐行调用 Enum 构造
+SENTIMENTS = tuple(Sentiment)
+URGENCIES = tuple(Urgency)
+
+
+def make_summary(comment: str) -> str:
+    """原文摘要（前10字）"""
+    return comment[:10] if len(comment) >= 10 else comment
+
+
+def to_timestamp(value) -> float:
+    """时间转换为 Unix 时间戳：支持数字、datetime 与 ISO 8601 字符串（无时区时按本机时区）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    from datetime import datetime
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise TypeError(f"无法识别的时间：{value!r}")
+
+
+class CommentRecord:
+    """带元数据的评论：发布时间（Unix 时间戳）、应用版本与平台"""
+
+    __slots__ = ("text", "timestamp", "version", "platform")
+
+    def __init__(self, text: str, timestamp: float, version: str = "", platform: str = ""):
+        self.text = text
+        self.timestamp = timestamp
+        self.version = version
+        self.platform = platform
+
+    @classmethod
+    def from_dict(cls, row: Dict, text_key: str = "text", time_key: str = "timestamp",
+                  version_key: str = "version", platform_key: str = "platform") -> "CommentRecord":
+        """由字典（如 JSON 行、CSV 行）构造，时间可以是时间戳、datetime 或 ISO 8601 字符串"""
+        return cls(
+            str(row[text_key]),
+            to_timestamp(row[time_key]),
+            str(row.get(version_key) or ""),
+            str(row.get(platform_key) or ""),
+        )
+
+    def __repr__(self) -> str:
+        return (f"CommentRecord(text={self.text[:20]!r}, timestamp={self.timestamp}, "
+                f"version={self.version!r}, platform={self.platform!r})")
+
+
+class AnalysisResult:
+    """单条评论的分析结果
+
+    字段均为编码，展示标签只在渲染时生成；仍支持 result["category"] 形式的字典式读取。
+    """
+
+    __slots__ = ("id", "category", "sentiment", "urgency", "core_issue", "original", "weight", "category_labels")
+
+    def __init__(self, id: int, category: int, sentiment: Sentiment, urgency: Urgency, core_issue: str,
+                 original: str, category_labels: Tuple[str, ...], weight: Optional[int] = None):
+        self.id = id
+        self.category = category
+        self.sentiment = sentiment
+        self.urgency = urgency
+        self.core_issue = core_issue
+        self.original = original
+        self.category_labels = category_labels
+        # 近重复折叠后代表的评论条数，未折叠时为 None
+        self.weight = weight
+
+    @property
+    def category_label(self) -> str:
+        return self.category_labels[self.category]
+
+    @property
+    def sentiment_label(self) -> str:
+        return SENTIMENT_LABELS[self.sentiment]
+
+    @property
+    def urgency_label(self) -> str:
+        return URGENCY_LABELS[self.urgency]
+
+    @property
+    def summary(self) -> str:
+        return make_summary(self.original)
+
+    def to_dict(self) -> Dict:
+        """转换为展示用字典（与早期版本 analyze 的结果格式一致）"""
+        result = {
+            "id": self.id,
+            "category": self.category_label,
+            "sentiment": self.sentiment_label,
+            "urgency": self.urgency_label,
+            "core_issue": self.core_issue,
+            "summary": self.summary,
+            "original": self.original
+        }
+        if self.weight is not None:
+            result["weight"] = self.weight
+        return result
+
+    def __getitem__(self, key: str):
+        return self.to_dict()[key]
+
+    def get(self, key: str, default=None):
+        return self.to_dict().get(key, default)
+
+    def __repr__(self) -> str:
+        return (f"AnalysisResult(id={self.id}, category={self.category_label!r}, "
+                f"sentiment={self.sentiment.name}, urgency={self.urgency.name}, core_issue={self.core_issue!r})")
+
+
+class BatchResult:
+    """列式批量分析结果"""
+
+    def __init__(self, comments: Sequence[str], category_labels: Tuple[str, ...]):
+        # 保留对输入的引用，摘要和原文按需取用
+        self.comments = comments
+        self.category_labels = category_labels
+        self.index = array('q')        # 对应输入中的位置，ID = 位置 + 1
+        self.categories = array('b')   # 编码见 category_labels，0 为无效数据
+        self.sentiments = array('b')   # 编码见 SENTIMENT_LABELS
+        self.urgencies = array('b')    # 编码见 URGENCY_LABELS
+        self.issue_codes = array('i')  # 编码见 issues
+        self.issues: List[str] = []
+        self._issue_lookup: Dict[str, int] = {}
+
+    def intern_issue(self, core_issue: str) -> int:
+        """返回核心槽点的编码，相同槽点只保存一份"""
+        issue_code = self._issue_lookup.get(core_issue)
+        if issue_code is None:
+            issue_code = self._issue_lookup[core_issue] = len(self.issues)
+            self.issues.append(core_issue)
+        return issue_code
+
+    def append(self, position: int, category: int, sentiment: int, urgency: int, core_issue: str):
+        """追加一行结果"""
+        self.index.append(position)
+        self.categories.append(category)
+        self.sentiments.append(sentiment)
+        self.urgencies.append(urgency)
+        self.issue_codes.append(self.intern_issue(core_issue))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def nbytes(self) -> int:
+        """估算占用的内存字节数（含引用的评论原文），用于按字节预算缓存"""
+        columns = (self.index, self.categories, self.sentiments, self.urgencies, self.issue_codes)
+        return (sum(column.itemsize * len(column) for column in columns)
+                + sum(map(sys.getsizeof, self.issues)) + sum(map(sys.getsizeof, self.comments)))
+
+    def record(self, i: int) -> AnalysisResult:
+        """第 i 行的结果记录"""
+        position = self.index[i]
+        return AnalysisResult(
+            position + 1,
+            self.categories[i],
+            SENTIMENTS[self.sentiments[i]],
+            URGENCIES[self.urgencies[i]],
+            self.issues[self.issue_codes[i]],
+            self.comments[position],
+            self.category_labels
+        )
+
+    def iter_records(self) -> Iterator[AnalysisResult]:
+        """逐行生成结果记录"""
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def row(self, i: int) -> Dict:
+        """第 i 行的字典视图"""
+        return self.record(i).to_dict()
+
+    def iter_dicts(self) -> Iterator[Dict]:
+        """逐行生成字典视图"""
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def to_dicts(self) -> List[Dict]:
+        """转换为字典列表"""
+        return list(self.iter_dicts())
+
+    def select(self, categories: Optional[Iterable[int]] = None,
+               urgencies: Optional[Iterable[int]] = None) -> array:
+        """按分类、紧迫度编码筛选，返回命中的行号（None 表示不筛选该列）"""
+        category_set = None if categories is None else set(categories)
+        urgency_set = None if urgencies is None else set(urgencies)
+        rows = array('q')
+        for i, (category, urgency) in enumerate(zip(self.categories, self.urgencies)):
+            if category_set is not None and category not in category_set:
+                continue
+            if urgency_set is not None and urgency not in urgency_set:
+                continue
+            rows.append(i)
+        return rows
+
+    def as_numpy(self) -> Dict:
+        """以 NumPy 数组视图返回各列（共享内存，不复制）"""
+        # numpy 为可选依赖，按需导入，不拖慢启动
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("as_numpy 需要安装 numpy") from None
+        return {
+            "index": np.frombuffer(self.index, dtype=np.int64),
+            "categories": np.frombuffer(self.categories, dtype=np.int8),
+            "sentiments": np.frombuffer(self.sentiments, dtype=np.int8),
+            "urgencies": np.frombuffer(self.urgencies, dtype=np.int8),
+            "issue_codes": np.frombuffer(self.issue_codes, dtype=np.int32),
+        }
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则包加载与编译
+规则包可以来自 JSON/TOML 文件，编译为不可变的 RuleSet，并按内容哈希缓存到磁盘（只保存 JSON 数据，读取时逐项校验）
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from keyword_matcher import KeywordMatcher
+from normalize import CJK_PATTERN
+from results import INVALID_CATEGORY, MAX_CATEGORY_CODE
+
+# 编译格式版本，RuleSet 结构变化时递增，使旧的磁盘缓存自动失效
+COMPILER_VERSION = 4
+
+URGENCY_LEVELS = ("P0", "P1", "P2")
+SENTIMENT_LEVELS = (1, 2, 3, 4, 5)
+
+# 进程内已编译规则集，按内容哈希索引
+_COMPILED: Dict[str, "RuleSet"] = {}
+
+
+class RuleSet:
+    """编译后的不可变规则集"""
+
+    __slots__ = (
+        "fingerprint", "categories", "fallback_category", "category_rank",
+        "category_labels", "category_codes", "issue_ranks", "keyword_cjk",
+        "default_issues", "sentiment_levels", "urgency_levels",
+        "keyword_categories", "keyword_sentiments", "keyword_urgency", "matcher",
+    )
+
+    def __init__(self, tables: Dict, fingerprint: str, matcher_state: Optional[Dict] = None):
+        categories = tuple((name, tuple(keywords)) for name, keywords in tables["categories"].items())
+        sentiment_levels = tuple(sorted((int(level), tuple(keywords)) for level, keywords in tables["sentiment"].items()))
+        # 紧迫度以编码保存（P0=0、P1=1、P2=2），按紧急程度排序
+        urgency_levels = tuple(sorted((URGENCY_LEVELS.index(level), tuple(keywords)) for level, keywords in tables["urgency"].items()))
+        # 分类编码：0 为无效数据，其余按规则包中的顺序
+        category_labels = (INVALID_CATEGORY,) + tuple(name for name, _ in categories)
+
+        # 没有关键词的分类作为兜底分类（内置规则为"5-其他"，normalize_tables 保证至少有一个）
+        fallback_category = [name for name, keywords in categories if not keywords][-1]
+
+        keywords: List[str] = []
+        for _, table_keywords in categories + sentiment_levels + urgency_levels:
+            keywords.extend(table_keywords)
+
+        # 关键词到各规则表的反向索引：各阶段只遍历命中的关键词，耗时与规则表大小无关
+        fallback_code = category_labels.index(fallback_category)
+        keyword_categories: Dict[str, List[int]] = {}
+        issue_ranks: Dict[int, Dict[str, int]] = {}
+        for code, (_, table_keywords) in enumerate(categories, 1):
+            # 提取核心槽点时优先查找短关键词：记录关键词在按长度排序后的位置
+            ranks = issue_ranks[code] = {}
+            for rank, keyword in enumerate(sorted(table_keywords, key=len)):
+                ranks.setdefault(keyword, rank)
+            if code == fallback_code:
+                continue
+            # 同一关键词在分类中重复出现时按出现次数计分
+            for keyword in table_keywords:
+                keyword_categories.setdefault(keyword, []).append(code)
+        keyword_sentiments: Dict[str, set] = {}
+        for level, table_keywords in sentiment_levels:
+            for keyword in table_keywords:
+                keyword_sentiments.setdefault(keyword, set()).add(level)
+        keyword_urgency: Dict[str, int] = {}
+        for level, table_keywords in urgency_levels:
+            for keyword in table_keywords:
+                keyword_urgency.setdefault(keyword, level)
+
+        values = {
+            "fingerprint": fingerprint,
+            "categories": categories,
+            "fallback_category": fallback_category,
+            # 分类优先级：序号小的优先
+            "category_rank": {name: _category_number(name) for name, _ in categories},
+            "category_labels": category_labels,
+            "category_codes": {name: code for code, name in enumerate(category_labels)},
+            "issue_ranks": issue_ranks,
+            # 各分类关键词中的汉字部分
+            "keyword_cjk": {kw: ''.join(CJK_PATTERN.findall(kw)) for _, kws in categories for kw in kws},
+            "default_issues": dict(tables.get("default_issues", {})),
+            "sentiment_levels": sentiment_levels,
+            "urgency_levels": urgency_levels,
+            "keyword_categories": {kw: tuple(codes) for kw, codes in keyword_categories.items()},
+            "keyword_sentiments": {kw: tuple(sorted(levels)) for kw, levels in keyword_sentiments.items()},
+            "keyword_urgency": keyword_urgency,
+            # matcher_state 为磁盘缓存中的自动机数据，省去重新构建
+            "matcher": KeywordMatcher(keywords, matcher_state),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RuleSet 是不可变对象")
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+def _category_number(category: str) -> int:
+    """解析分类序号，如 "1-功能稳定性" -> 1"""
+    prefix = category.split('-')[0]
+    return int(prefix) if prefix.isdigit() else 999
+
+
+def normalize_tables(raw: Dict) -> Dict:
+    """校验规则包内容，并整理为统一结构"""
+    for section in ("categories", "sentiment", "urgency"):
+        if not isinstance(raw.get(section), dict):
+            raise ValueError(f"规则包缺少 {section} 配置")
+
+    sentiment = {}
+    for level, keywords in raw["sentiment"].items():
+        if int(level) not in SENTIMENT_LEVELS:
+            raise ValueError(f"未知的情感等级：{level}")
+        sentiment[str(int(level))] = list(keywords)
+
+    urgency = {}
+    for level, keywords in raw["urgency"].items():
+        if level not in URGENCY_LEVELS:
+            raise ValueError(f"未知的紧迫度等级：{level}")
+        urgency[level] = list(keywords)
+
+    categories = {name: list(keywords) for name, keywords in raw["categories"].items()}
+    # 未命中任何关键词的评论归入兜底分类，缺少时每条评论都无法归类
+    if not any(not keywords for keywords in categories.values()):
+        raise ValueError('规则包缺少兜底分类：至少需要一个关键词为空的分类（如 "5-其他": []）')
+    # 编码 0 留给无效数据，各分类从 1 起编码
+    if len(categories) > MAX_CATEGORY_CODE:
+        raise ValueError(f"规则包的分类过多：{len(categories)} 个（最多 {MAX_CATEGORY_CODE} 个）")
+
+    return {
+        "categories": categories,
+        "sentiment": sentiment,
+        "urgency": urgency,
+        "default_issues": dict(raw.get("default_issues", {})),
+    }
+
+
+def fingerprint_tables(tables: Dict) -> str:
+    """计算规则内容的哈希，作为缓存键"""
+    payload = json.dumps([COMPILER_VERSION, tables], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def default_cache_dir() -> str:
+    """默认的编译缓存目录"""
+    return os.environ.get("VOC_RULES_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "voc_master")
+
+
+def compile_rules(raw: Dict, cache_dir: Optional[str] = None) -> RuleSet:
+    """编译规则表；cache_dir 不为空时读写磁盘缓存"""
+    tables = normalize_tables(raw)
+    fingerprint = fingerprint_tables(tables)
+
+    ruleset = _COMPILED.get(fingerprint)
+    if ruleset is not None:
+        return ruleset
+
+    cache_path = os.path.join(cache_dir, f"rules-{fingerprint}.json") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        ruleset = _read_cache(cache_path, tables, fingerprint)
+
+    if ruleset is None:
+        ruleset = RuleSet(tables, fingerprint)
+        if cache_path:
+            _write_cache(cache_path, tables, ruleset)
+
+    _COMPILED[fingerprint] = ruleset
+    return ruleset
+
+
+def _read_cache(cache_path: str, tables: Dict, fingerprint: str) -> Optional[RuleSet]:
+    """读取缓存的自动机数据；缓存只含 JSON 数据，内容与规则不符或已损坏时返回 None，由调用方重新编译"""
+    try:
+        # 只信任当前用户自己写入的缓存
+        if hasattr(os, "getuid") and os.stat(cache_path).st_uid != os.getuid():
+            return None
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") != fingerprint or cached.get("tables") != tables:
+            return None
+        return RuleSet(tables, fingerprint, cached["matcher"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _write_cache(cache_path: str, tables: Dict, ruleset: RuleSet):
+    """原子写入缓存文件，多个进程同时启动也不会读到半截文件"""
+    try:
+        import tempfile
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": ruleset.fingerprint, "tables": tables, "matcher": ruleset.matcher.to_state()},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # 缓存只是加速手段，写入失败不影响使用
+        pass
+
+
+def read_rule_pack(path: str) -> Dict:
+    """读取 JSON 或 TOML 格式的规则包"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        return tomllib.loads(data.decode("utf-8"))
+    return json.loads(data.decode("utf-8"))
+
+
+def load_rule_pack(path: str, cache_dir: Optional[str] = None) -> RuleSet:
+    """加载规则包文件并编译（默认使用磁盘缓存）"""
+    return compile_rules(read_rule_pack(path), cache_dir or default_cache_dir())
+
+
+def tables_from_analyzer(analyzer_cls) -> Dict:
+    """从分析器类属性中读取内置规则表"""
+    return {
+        "categories": analyzer_cls.CATEGORY_KEYWORDS,
+        "sentiment": analyzer_cls.SENTIMENT_KEYWORDS,
+        "urgency": analyzer_cls.URGENCY_KEYWORDS,
+        "default_issues": analyzer_cls.DEFAULT_ISSUES,
+    }
+
+
+def export_rule_pack(tables: Dict, path: str):
+    """将规则表导出为 JSON 规则包，便于在此基础上修改"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(normalize_tables(tables), f, ensure_ascii=False, indent=2)
+
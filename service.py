@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 分析服务
+基于标准库的 JSON 接口（HTTP/1.1 长连接），并发的小请求合并成微批次走 analyze_batch
+
+    python service.py --port 8080
+
+    POST /analyze        {"comment": "..."}          -> 单条结果
+    POST /analyze/batch  {"comments": ["...", ...]}  -> {"results": [...], "summary": {...}}
+    GET  /health                                     -> 服务与缓存状态
+    GET  /metrics                                    -> 流水线指标（Prometheus 文本格式，需 --metrics）
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aggregator import StatsAggregator
+from comment_analyzer import CommentAnalyzer
+from exporters import result_row
+from results import BatchResult
+
+# 单个请求体的上限（字节）
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# 等待分析结果的超时（秒）
+REQUEST_TIMEOUT = 30.0
+
+# 停止信号
+_STOP = object()
+
+
+class _Call:
+    """在批处理线程中执行的函数调用"""
+
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn: Callable, future: Future):
+        self.fn = fn
+        self.future = future
+
+    def run(self):
+        try:
+            self.future.set_result(self.fn())
+        except Exception as e:
+            self.future.set_exception(e)
+
+
+class MicroBatcher:
+    """把并发请求中的评论合并成批，由单个线程调用 analyze_batch
+
+    分析器只在批处理线程中使用，无需加锁。默认不额外等待：上一批分析期间到达的请求自然组成下一批，
+    max_wait 大于 0 时会在第一条请求到达后再等待这么久以凑批。
+    """
+
+    def __init__(self, analyzer: CommentAnalyzer, max_batch: int = 256, max_wait: float = 0.0):
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self.comments = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="voc-batcher", daemon=True)
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+
+    def stop(self):
+        """处理完已提交的请求后停止"""
+        if self._running:
+            self._running = False
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, comments: List[str]) -> Future:
+        """提交一组评论，Future 的结果为 (BatchResult, 起始行, 条数)"""
+        if not self._running:
+            raise RuntimeError("批处理线程未运行")
+        future = Future()
+        self._queue.put((comments, future))
+        return future
+
+    def call(self, fn: Callable) -> Future:
+        """在批处理线程中执行 fn()：读取只由该线程修改的状态（如流水线指标）时不会与分析交错"""
+        if not self._running:
+            raise RuntimeError("批处理线程未运行")
+        future = Future()
+        self._queue.put(_Call(fn, future))
+        return future
+
+    def info(self) -> Dict:
+        """批处理统计"""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "comments": self.comments,
+            "avg_batch_size": round(self.comments / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _collect(self, first, calls: List[_Call]) -> Tuple[list, bool]:
+        """从第一条请求开始凑批，返回 (请求列表, 是否收到停止信号)；期间收到的调用放入 calls，批处理后执行"""
+        entries = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return entries, True
+            if isinstance(item, _Call):
+                calls.append(item)
+                continue
+            entries.append(item)
+            size += len(item[0])
+        return entries, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if isinstance(item, _Call):
+                item.run()
+                continue
+            calls: List[_Call] = []
+            entries, stopping = self._collect(item, calls)
+            self._analyze_entries(entries)
+            for call in calls:
+                call.run()
+
+    def _analyze_entries(self, entries: list):
+        """分析一批请求并分别设置各请求的结果"""
+        comments: List[str] = []
+        for entry_comments, _ in entries:
+            comments.extend(entry_comments)
+        try:
+            batch = self.analyzer.analyze_batch(comments)
+        except Exception as e:
+            for _, future in entries:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.requests += len(entries)
+        self.comments += len(comments)
+        offset = 0
+        for entry_comments, future in entries:
+            future.set_result((batch, offset, len(entry_comments)))
+            offset += len(entry_comments)
+
+
+def batch_rows(batch: BatchResult, offset: int, count: int) -> List[Dict]:
+    """取出批中属于某个请求的结果行，ID 按请求内的位置重新编号"""
+    rows = []
+    for k in range(count):
+        row = result_row(batch.record(offset + k))
+        row["id"] = k + 1
+        rows.append(row)
+    return rows
+
+
+def batch_summary(batch: BatchResult, offset: int, count: int) -> Dict:
+    """某个请求的分类统计"""
+    stats = StatsAggregator(batch.category_labels)
+    for i in range(offset, offset + count):
+        stats.add(batch.categories[i], batch.sentiments[i], batch.urgencies[i],
+                  batch.issues[batch.issue_codes[i]])
+    return stats.summary()
+
+
+class ServiceError(Exception):
+    """以指定状态码返回给客户端的错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """JSON 接口处理"""
+
+    protocol_version = "HTTP/1.1"
+    # 长连接上的小响应不等待合并发送，降低延迟
+    disable_nagle_algorithm = True
+    server_version = "VOCAnalysis/1.0"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "batcher": self.server.batcher.info(),
+                "cache": self.server.batcher.analyzer.cache_info(),
+            })
+        elif self.path == "/metrics" and self.server.batcher.analyzer.metrics is not None:
+            # 指标只由批处理线程更新，快照也交给该线程生成，不会读到分析到一半的计数
+            try:
+                body = self.server.batcher.call(self.server.batcher.analyzer.metrics.to_prometheus).result(
+                    timeout=REQUEST_TIMEOUT
+                ).encode("utf-8")
+            except (RuntimeError, FutureTimeoutError) as e:
+                self._send_json(503, {"error": f"指标暂不可用：{e or '超时'}"})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"未知路径：{self.path}"})
+
+    def do_POST(self):
+        try:
+            if self.path == "/analyze":
+                comment = self._read_json().get("comment")
+                if not isinstance(comment, str):
+                    raise ServiceError(400, "comment 必须为字符串")
+                batch, offset, count = self._analyze([comment])
+                self._send_json(200, batch_rows(batch, offset, count)[0])
+            elif self.path == "/analyze/batch":
+                comments = self._read_json().get("comments")
+                if not isinstance(comments, list) or not all(isinstance(c, str) for c in comments):
+                    raise ServiceError(400, "comments 必须为字符串列表")
+                batch, offset, count = self._analyze(comments)
+                self._send_json(200, {
+                    "results": batch_rows(batch, offset, count),
+                    "summary": batch_summary(batch, offset, count),
+                })
+            else:
+                # 未读取的请求体会破坏长连接上的下一个请求
+                self._discard_body()
+                raise ServiceError(404, f"未知路径：{self.path}")
+        except ServiceError as e:
+            self._send_json(e.status, {"error": str(e)})
+
+    def _analyze(self, comments: List[str]) -> Tuple[BatchResult, int, int]:
+        if not comments:
+            return BatchResult([], self.server.batcher.analyzer.rules.category_labels), 0, 0
+        try:
+            future = self.server.batcher.submit(comments)
+        except RuntimeError as e:
+            raise ServiceError(503, str(e))
+        try:
+            return future.result(REQUEST_TIMEOUT)
+        except FutureTimeoutError:
+            raise ServiceError(504, "分析超时")
+        except Exception as e:
+            raise ServiceError(500, f"分析失败：{e}")
+
+    def _read_json(self) -> Dict:
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            raise ServiceError(411, "缺少 Content-Length")
+        try:
+            length = int(length)
+        except ValueError:
+            self.close_connection = True
+            raise ServiceError(400, "Content-Length 不合法")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise ServiceError(413, f"请求体超过 {MAX_BODY_BYTES} 字节")
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, ValueError):
+            raise ServiceError(400, "请求体不是合法的 JSON")
+        if not isinstance(payload, dict):
+            raise ServiceError(400, "请求体必须为 JSON 对象")
+        return payload
+
+    def _discard_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = MAX_BODY_BYTES + 1
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+        elif length:
+            self.rfile.read(length)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 默认逐请求写 stderr，高并发下开销明显；需要时通过 --access-log 打开
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """每个连接一个线程，分析统一交给批处理线程"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], analyzer: Optional[CommentAnalyzer] = None,
+                 max_batch: int = 256, max_wait: float = 0.0, access_log: bool = False):
+        super().__init__(address, AnalysisHandler)
+        self.access_log = access_log
+        self.batcher = MicroBatcher(analyzer or CommentAnalyzer(), max_batch, max_wait)
+        self.batcher.start()
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评论分析 HTTP 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rules", help="JSON/TOML 规则包路径（默认使用内置规则）")
+    parser.add_argument("--max-batch", type=int, default=256, help="每个微批次最多合并的评论数")
+    parser.add_argument("--max-wait-ms", type=float, default=0.0, help="凑批的额外等待时间（毫秒）")
+    parser.add_argument("--access-log", action="store_true", help="输出逐请求访问日志")
+    parser.add_argument("--metrics", action="store_true", help="开启流水线指标，通过 GET /metrics 导出")
+    args = parser.parse_args()
+
+    analyzer = CommentAnalyzer.from_rule_pack(args.rules) if args.rules else CommentAnalyzer()
+    if args.metrics:
+        analyzer.enable_metrics()
+    server = AnalysisServer((args.host, args.port), analyzer, args.max_batch,
+                            args.max_wait_ms / 1000, args.access_log)
+    print(f"评论分析服务已启动：http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
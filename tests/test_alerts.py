@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+激增告警测试：较大的 z 分数阈值下告警线的计算必须终止
+"""
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import SpikeDetector, _log_normal_tail, _log_poisson_tail, _poisson_limit  # noqa: E402
+from results import Sentiment, Urgency  # noqa: E402
+
+
+class PoissonLimitTest(unittest.TestCase):
+    """泊松告警线"""
+
+    def test_large_thresholds_terminate(self):
+        for threshold in (4.0, 8.0, 8.3, 9.0, 12.0, 40.0):
+            for mean in (0.0, 0.5, 3.0, 12.3, 49.9, 50.0, 80.0):
+                limit = _poisson_limit(mean, threshold)
+                self.assertTrue(math.isfinite(limit))
+                self.assertGreater(limit, mean)
+
+    def test_limit_grows_with_threshold(self):
+        for mean in (0.5, 12.3, 49.9):
+            limits = [_poisson_limit(mean, threshold) for threshold in (2.0, 4.0, 6.0, 9.0, 12.0)]
+            self.assertEqual(limits, sorted(limits))
+
+    def test_log_tail_matches_cumulative_sum(self):
+        # 上尾概率仍可由累计求和分辨时，对数域的直接计算给出同样的告警线
+        for threshold in (3.0, 4.0, 6.0):
+            for mean in (0.5, 3.0, 12.3, 49.9):
+                k = math.floor(mean) + 1
+                while _log_poisson_tail(mean, k) > _log_normal_tail(threshold):
+                    k += 1
+                self.assertEqual(k, _poisson_limit(mean, threshold))
+
+
+class SpikeDetectorTest(unittest.TestCase):
+    """检测器在较大阈值下正常累积基线并告警"""
+
+    def test_large_threshold_detects_spike(self):
+        detector = SpikeDetector(("无效数据", "稳定性"), interval=60, threshold=9, warmup=2)
+        for interval in range(30):
+            for _ in range(12):
+                detector.add(1, Sentiment.NEUTRAL, Urgency.P0, "闪退", timestamp=interval * 60)
+        alerts = []
+        for _ in range(200):
+            alerts += detector.add(1, Sentiment.NEUTRAL, Urgency.P0, "闪退", timestamp=30 * 60)
+        self.assertEqual([alert.kind for alert in alerts], ["volume"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近重复折叠：向量化签名与纯 Python 实现一致，刷屏评论被折叠到同一簇
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusGenerator  # noqa: E402
+from dedupe import NearDuplicateCollapser, _numpy  # noqa: E402
+
+
+class NearDuplicateCollapserTest(unittest.TestCase):
+
+    def test_collapse_near_duplicates(self):
+        comments = [
+            "更新后一直闪退，根本打不开！！",
+            "更新后一直闪退根本打不开😡",
+            "会员太贵了，不值这个价",
+            "更新后 一直闪退，根本打不开",
+        ]
+        clusters = NearDuplicateCollapser(use_numpy=False).collapse(comments)
+        self.assertEqual(clusters, [(0, 3), (2, 1)])
+
+    @unittest.skipIf(_numpy() is None, "需要 numpy")
+    def test_numpy_signatures_match_pure_python(self):
+        comments = CorpusGenerator(seed=5).take(3000) + ["", "a", "ab", "😀", "𠀀𠀁x"]
+        for shingle_size in (1, 2, 3):
+            collapser = NearDuplicateCollapser(shingle_size=shingle_size)
+            texts = [collapser.normalize(comment) for comment in comments]
+            self.assertEqual(collapser.signatures(texts), [collapser.signature(text) for text in texts])
+            pure = NearDuplicateCollapser(shingle_size=shingle_size, use_numpy=False)
+            self.assertEqual(collapser.collapse(comments), pure.collapse(comments))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回归测试：优化后的分析结果必须与最初版本逐字节一致
+基准摘要由最初版本的 comment_analyzer.py 对同一份固定种子语料生成
+"""
+
+import hashlib
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusGenerator  # noqa: E402
+from comment_analyzer import CommentAnalyzer  # noqa: E402
+
+CORPUS_SEED = 2024
+CORPUS_SIZE = 40000
+
+# 最初版本 generate_report() 输出的 SHA-256 与字符数
+BASELINE_REPORT_SHA256 = "fd3f2cee72f6b8e982de88d663d73937a9b8d1bdb65a18953e7cec085c2a4f2f"
+BASELINE_REPORT_LENGTH = 2264667
+
+
+class BaselineReportTest(unittest.TestCase):
+    """4 万条语料的完整报告与最初版本一致"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.comments = CorpusGenerator(seed=CORPUS_SEED).take(CORPUS_SIZE)
+
+    def test_report_matches_baseline(self):
+        analyzer = CommentAnalyzer()
+        analyzer.add_comments(self.comments)
+        report = analyzer.generate_report()
+        self.assertEqual(len(report), BASELINE_REPORT_LENGTH)
+        self.assertEqual(hashlib.sha256(report.encode("utf-8")).hexdigest(), BASELINE_REPORT_SHA256)
+
+
+if __name__ == "__main__":
+    unittest.main()
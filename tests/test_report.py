@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告渲染测试：评论中的竖线与换行不能破坏 Markdown 表格
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_analyzer import CommentAnalyzer  # noqa: E402
+
+
+class MarkdownDetailTableTest(unittest.TestCase):
+    """明细表每条评论占一行、六列"""
+
+    def test_multiline_and_pipe_comments(self):
+        analyzer = CommentAnalyzer()
+        analyzer.add_comments(["多行\n闪退", "a|b卡顿", "换行\r\n扣费|太贵", "正常评论"])
+        analyzer.analyze()
+        lines = analyzer.generate_detail_table().split("\n")
+        self.assertEqual(len(lines), 2 + 4)
+        for line in lines[2:]:
+            # 去掉转义的竖线后恰好剩下 7 条分隔竖线
+            self.assertEqual(line.replace("\\|", "").count("|"), 7)
+        self.assertIn("| 多行 闪退 |", lines[2])
+        self.assertIn("| a\\|b卡顿 |", lines[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则包校验测试：缺少兜底分类或分类编码超出单字节范围的规则包在加载时即报错
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_analyzer import CommentAnalyzer  # noqa: E402
+from results import MAX_CATEGORY_CODE  # noqa: E402
+from rules import compile_rules, normalize_tables  # noqa: E402
+
+
+def _keyword(n: int) -> str:
+    return "关键" + chr(0x4E00 + n)
+
+
+def _rule_pack(categories: int) -> dict:
+    # 各分类的关键词互不包含
+    pack = {f"{n}-分类{n}": [_keyword(n)] for n in range(1, categories)}
+    pack[f"{categories}-其他"] = []
+    return {"categories": pack, "sentiment": {"1": ["垃圾"]}, "urgency": {"P0": ["闪退"]}}
+
+
+class NormalizeTablesTest(unittest.TestCase):
+    """normalize_tables 的校验"""
+
+    def test_missing_fallback_category(self):
+        raw = _rule_pack(3)
+        raw["categories"]["3-其他"] = ["其他"]
+        with self.assertRaises(ValueError):
+            normalize_tables(raw)
+
+    def test_category_limit(self):
+        with self.assertRaises(ValueError):
+            normalize_tables(_rule_pack(MAX_CATEGORY_CODE + 1))
+        analyzer = CommentAnalyzer(compile_rules(_rule_pack(MAX_CATEGORY_CODE)))
+        batch = analyzer.analyze_batch([_keyword(MAX_CATEGORY_CODE - 1), "没有命中"])
+        self.assertEqual(list(batch.categories), [MAX_CATEGORY_CODE - 1, MAX_CATEGORY_CODE])
+
+
+if __name__ == "__main__":
+    unittest.main()